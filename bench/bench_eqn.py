@@ -0,0 +1,115 @@
+'''Micro-benchmark of EQN construction, munge and vars_pos
+
+Compares the table lookups in eqn.py against the shift loops they
+replaced (kept below as LoopEQN).
+
+Usage: python bench/bench_eqn.py
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import random
+from timeit import repeat
+
+from eqn import EQN
+
+ROUNDS = 10
+
+class LoopEQN(EQN):
+    '''EQN as it was before the lookup tables'''
+    def __init__(self, sr:int, sc:int, mask:int, mines:int):
+        assert mask > 0 and mask < 2**9
+        while not mask & (1|2|4):
+            sr += 1
+            mask >>= 3
+        while not mask & (1|8|64):
+            sc += 1
+            mask >>= 1
+
+        self._sr, self._sc = sr, sc
+        self._mask = mask
+        assert mines >= 0
+        self._mines = mines
+        self._hash = hash((sr, sc, mask))
+
+    def munge(self, other:EQN, diff:bool):
+        assert isinstance(other, EQN)
+        sr, sc, mask = other.sr, other.sc, other.mask
+
+        if abs(sr-self.sr) >= 3 or abs(sc-self.sc) >= 3:
+            mask = 0
+        else:
+            while sc < self.sc:
+                mask &= (1|8|64)^511
+                mask >>= 1
+                sc += 1
+            while sc > self.sc:
+                mask &= (4|32|256)^511
+                mask <<= 1
+                sc -= 1
+            while sr < self.sr:
+                mask &= (1|2|4)^511
+                mask >>= 3
+                sr += 1
+            while sr > self.sr:
+                mask &= (64|128|256)^511
+                mask <<= 3
+                sr -= 1
+
+        if diff: mask ^= 511
+        return self.mask & mask
+
+    @property
+    def vars_pos(self):
+        bit = 1
+        ret = []
+        for dr in range(3):
+            for dc in range(3):
+                if self.mask & bit:
+                    ret.append((self.sr+dr, self.sc+dc))
+                bit <<= 1
+        return ret
+
+def main():
+    rng = random.Random(0)
+    args = [(rng.randrange(4), rng.randrange(4), rng.randrange(1, 512), 0)
+        for _ in range(1000)]
+
+    cases = {}
+    for cls in (LoopEQN, EQN):
+        eqns = [cls(*a) for a in args]
+        pairs = list(zip(eqns, eqns[1:]))
+        cases[cls] = [
+            (lambda cls=cls: [cls(*a) for a in args], len(args)),
+            (lambda pairs=pairs: [e0.munge(e1, True) for e0,e1 in pairs],
+                len(pairs)),
+            (lambda eqns=eqns: [e.vars_pos for e in eqns], len(eqns)),
+        ]
+        cases[cls, 'out'] = (
+            [(e.sr, e.sc, e.mask) for e in eqns],
+            [e0.munge(e1, d) for e0,e1 in pairs for d in (False,True)],
+            [e.vars_pos for e in eqns],
+        )
+    assert cases[LoopEQN, 'out'] == cases[EQN, 'out']
+
+    # warm up, then alternate the variants round by round so drift
+    # (frequency scaling, other load) hits both alike; keep the best
+    for cls in (LoopEQN, EQN):
+        for fn, _ in cases[cls]: repeat(fn, number=20, repeat=1)
+    best = {cls: [float('inf')]*3 for cls in (LoopEQN, EQN)}
+    for r in range(ROUNDS):
+        order = (LoopEQN, EQN) if r % 2 else (EQN, LoopEQN)
+        for k in range(3):
+            for cls in order:
+                fn, n = cases[cls][k]
+                t = min(repeat(fn, number=20, repeat=3))/20/n*1e9
+                best[cls][k] = min(best[cls][k], t)
+
+    print(f'{"":10}{"loops":>10}{"tables":>10}')
+    for k, name in enumerate(('__init__', 'munge', 'vars_pos')):
+        old, new = best[LoopEQN][k], best[EQN][k]
+        print(f'{name:10}{old:>8.0f}ns{new:>8.0f}ns')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+'''Modify/dig counts with and without the exact frontier solver
+
+Usage: python bench/bench_frontier.py [boards_per_mode]
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import random
+from collections import Counter
+from functools import partialmethod
+from time import perf_counter
+
+import solver
+from game import Game, MODES
+
+def run(mode, boards:int, exact:bool):
+    Solver = solver.Solver
+    solver.Solver = type('Solver', (Solver,), {
+        '__init__': partialmethod(Solver.__init__, exact=exact)})
+    counts:Counter[str] = Counter()
+    t = perf_counter()
+    for i in range(boards):
+        rng = random.Random(i)
+        start = rng.randrange(mode.height), rng.randrange(mode.width)
+        game = Game(mode, rng=rng)
+        game.open(*start)
+        counts.update(game.gen_counts)
+    solver.Solver = Solver
+    return counts, (perf_counter()-t)/boards
+
+def main():
+    boards = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(f'{"":8}{"exact":>6}{"modify":>8}{"dig":>6}{"restart":>8}{"time":>10}')
+    for name, mode in MODES.items():
+        for exact in (False, True):
+            counts, t = run(mode, boards, exact)
+            print(f'{name:8}{"on" if exact else "off":>6}'
+                f'{counts["modify"]:>8}{counts["dig"]:>6}'
+                f'{counts["restart"]:>8}{t*1e3:>8.0f}ms')
+
+if __name__ == '__main__':
+    main()
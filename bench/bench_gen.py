@@ -0,0 +1,118 @@
+'''Reproducible generation benchmark over all modes
+
+Every board is generated from its own seeded rng, so two runs on the
+same tree produce the same layouts (checked through a digest) and only
+the timings differ.
+
+Usage: python bench/bench_gen.py [-n boards] [-o out.json] [--compare old.json]
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import argparse
+import hashlib
+import json
+import platform
+import random
+import statistics
+from collections import Counter
+from datetime import datetime, timezone
+from time import perf_counter
+
+from game import Game, Mode, MODES
+
+# beyond the gui modes
+LARGE = {
+    'Large': Mode(30, 40, 240),
+    'Huge': Mode(50, 60, 600),
+}
+
+def bench_mode(mode:Mode, boards:int, seed:int, **kwargs):
+    times:list[float] = []
+    counts:Counter[str] = Counter()
+    digest = hashlib.sha256()
+    for i in range(boards):
+        rng = random.Random(seed+i)
+        start = rng.randrange(mode.height), rng.randrange(mode.width)
+        t = perf_counter()
+        game = Game(mode, rng=rng, **kwargs)
+        game.open(*start)
+        times.append(perf_counter() - t)
+        counts.update(game.gen_counts)
+        digest.update(repr((start, game.mine_coords)).encode())
+
+    return {
+        'mode': [mode.height, mode.width, mode.mines],
+        'boards': boards,
+        'seed': seed,
+        'mean': statistics.fmean(times),
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'counts': {k: counts[k] for k in ('modify', 'dig', 'restart')},
+        'digest': digest.hexdigest(),
+    }
+
+def compare(new:dict, old:dict, threshold:float):
+    '''Print median ratios new/old, return names of modes that got
+    slower than threshold'''
+    slower = []
+    for name, res in new['modes'].items():
+        if name not in old['modes']: continue
+        prev = old['modes'][name]
+        ratio = res['median']/prev['median']
+        same = 'same' if res['digest'] == prev['digest'] else 'DIFFERENT'
+        print(f'{name:8}{ratio:>8.2f}x  layouts {same}')
+        if ratio > threshold: slower.append(name)
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--boards', type=int, default=10,
+        help='boards per mode')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--large', action='store_true',
+        help=f'also run {", ".join(LARGE)}')
+    parser.add_argument('--array', action='store_true')
+    parser.add_argument('-o', '--out', help='write results as JSON')
+    parser.add_argument('--compare', metavar='OLD',
+        help='JSON of an earlier run, exit 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=1.1,
+        help='median ratio counted as a regression, default 1.1')
+    args = parser.parse_args()
+
+    modes = dict(MODES)
+    if args.large: modes.update(LARGE)
+    kwargs = dict(array=args.array)
+
+    result = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'options': kwargs,
+        'modes': {},
+    }
+    print(f'{"":8}{"median":>10}{"mean":>10}{"modify":>8}{"dig":>6}'
+        f'{"restart":>8}  digest')
+    for name, mode in modes.items():
+        res = bench_mode(mode, args.boards, args.seed, **kwargs)
+        result['modes'][name] = res
+        c = res['counts']
+        print(f'{name:8}{res["median"]*1e3:>8.1f}ms{res["mean"]*1e3:>8.1f}ms'
+            f'{c["modify"]:>8}{c["dig"]:>6}{c["restart"]:>8}'
+            f'  {res["digest"][:12]}')
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f: old = json.load(f)
+        slower = compare(result, old, args.threshold)
+        if slower:
+            print(f'regression in {", ".join(slower)}')
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+'''Sprite preparation and mode switch time, with and without the shared
+sprites of _GridView
+
+Without a display only the pillow side (scaling the sprites) is timed.
+With one, GUI._set_mode is timed over all modes, once reusing the
+PhotoImages and once converting them again for every grid as before.
+
+Usage: python bench/bench_sprites.py [runs]
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import statistics
+from time import perf_counter
+
+from helper import get_img
+from game import MODES
+from view import _GridView
+
+def time_sprites(runs:int):
+    '''Best time to get all sprites, scaled anew / from the cache'''
+    files, size = _GridView.IMG_FILES.values(), _GridView.IMG_SIZE
+    scaled, cached = [], []
+    for _ in range(runs):
+        t = perf_counter()
+        for file in files: get_img.__wrapped__(file, size).load()
+        scaled.append(perf_counter() - t)
+        t = perf_counter()
+        for file in files: get_img(file, size)
+        cached.append(perf_counter() - t)
+    return min(scaled), min(cached)
+
+def time_set_mode(runs:int, shared:bool):
+    '''Median time of GUI._set_mode, switching through all modes'''
+    from gui import GUI
+    gui = GUI()
+    gui._root.update()
+    times = []
+    for _ in range(runs):
+        for mode in MODES:
+            if not shared: _GridView._shared = None
+            gui._choice.set(mode)
+            t = perf_counter()
+            gui._set_mode()
+            gui._root.update()
+            times.append(perf_counter() - t)
+    gui._root.destroy()
+    return statistics.median(times)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    scaled, cached = time_sprites(runs)
+    print(f'sprites   scaled {scaled*1e3:7.2f}ms   cached {cached*1e3:7.3f}ms')
+
+    from tkinter import Tk, TclError
+    try: Tk().destroy()
+    except TclError as e:
+        print(f'no display, mode switch not timed ({e})')
+        return
+    per_grid = time_set_mode(runs, False)
+    shared = time_set_mode(runs, True)
+    print(f'set_mode  per grid {per_grid*1e3:7.2f}ms   shared {shared*1e3:7.2f}ms')
+
+if __name__ == '__main__':
+    main()
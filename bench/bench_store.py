@@ -0,0 +1,76 @@
+'''Compare store.Store against npstore.NPStore (memory and throughput)
+
+Usage: python bench/bench_store.py [num_eqns]
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import random
+import tracemalloc
+from time import perf_counter
+
+from eqn import EQN
+from store import Store
+from npstore import NPStore
+import solver
+from game import Game, Mode
+
+def random_eqns(n:int, size:int, seed:int=0):
+    rng = random.Random(seed)
+    eqns = {}
+    while len(eqns) < n:
+        e = EQN(rng.randrange(size), rng.randrange(size),
+            rng.randrange(1, 512), 0)
+        eqns[e] = e
+    return list(eqns)
+
+def memory(store_cls, eqns:list[EQN]):
+    tracemalloc.start()
+    store = store_cls()
+    base = tracemalloc.get_traced_memory()[0]
+    for e in eqns: store.add(e)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used, store
+
+def timeit(fn, repeat:int):
+    t = perf_counter()
+    for _ in range(repeat): fn()
+    return (perf_counter()-t)/repeat
+
+def generation(store_cls, mode:Mode, boards:int):
+    solver.Store = store_cls
+    random.seed(0)
+    rng = random.Random(0)
+    t = perf_counter()
+    for _ in range(boards):
+        game = Game(mode)
+        game.open(rng.randrange(mode.height), rng.randrange(mode.width))
+    solver.Store = Store
+    return (perf_counter()-t)/boards
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(n**.5)*2 # roughly a frontier of n equations
+    eqns = random_eqns(n, size)
+    rng = random.Random(1)
+    queries = [EQN(rng.randrange(size), rng.randrange(size), 1, 0)
+        for _ in range(1000)]
+
+    print(f'{n} equations on {size}x{size}')
+    print(f'{"":8}{"memory":>12}{"add":>12}{"overlap":>12}'
+        f'{"conflicts":>12}{"Expert gen":>12}')
+    for store_cls in (Store, NPStore):
+        mem, store = memory(store_cls, eqns)
+        t_add = timeit(lambda: [store_cls().add(e) for e in eqns], 3)/n
+        t_ovl = timeit(lambda: [store.get_overlap(q) for q in queries], 3)
+        t_ovl /= len(queries)
+        t_cfl = timeit(store.get_conflicts, 3)
+        t_gen = generation(store_cls, Mode(20,30, 180), 5)
+        print(f'{store_cls.__name__:8}{mem/1024:>10.0f}KB'
+            f'{t_add*1e6:>10.1f}us{t_ovl*1e6:>10.1f}us'
+            f'{t_cfl*1e3:>10.1f}ms{t_gen*1e3:>10.0f}ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+'''Click-to-paint latency of a flood-fill click, with and without
+Game.batch (needs a display)
+
+Without a display, --headless swaps GameView for a stand-in that only
+counts flushes (update() calls), and times the click without painting.
+
+Usage: python bench/bench_view.py [--headless] [height width mines]
+'''
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import src # set up import path
+
+import random
+from contextlib import contextmanager
+from time import perf_counter
+
+from game import Game, Mode
+
+@contextmanager
+def unbatched(game:Game):
+    yield
+
+class _FlushView:
+    '''Batching of GameView without Tk: a change outside a batch
+    flushes at once, a batch flushes once at its end'''
+    def __init__(self):
+        self.flushes = 0
+        self._depth = 0
+        self._pending = {}
+
+    def adjust_grid(self, row:int, col:int, item):
+        if self._depth: self._pending[row,col] = item
+        else: self.flushes += 1
+
+    def begin(self):
+        self._depth += 1
+
+    def commit(self):
+        self._depth -= 1
+        if self._depth: return
+        self._pending.clear()
+        self.flushes += 1
+
+    def update(self):
+        pass
+
+def click_latency(root, game:Game, start:tuple[int,int], runs:int):
+    times = []
+    for _ in range(runs):
+        game.restart(False)
+        root.update()
+        t = perf_counter()
+        game.open(*start)
+        root.update() # paint
+        times.append(perf_counter()-t)
+    return min(times), sum(times)/len(times)
+
+def flushes(view:_FlushView, game:Game, start:tuple[int,int]):
+    game.restart(False)
+    view.flushes = 0
+    game.open(*start)
+    return view.flushes
+
+def main():
+    args = sys.argv[1:]
+    headless = '--headless' in args
+    if headless: args.remove('--headless')
+    h, w, mines = map(int, args[:3]) if len(args) > 2 \
+        else (20, 30, 60)
+    random.seed(0)
+    game = Game(Mode(h, w, mines))
+    start = h//2, w//2
+
+    if headless:
+        root = view = _FlushView()
+    else:
+        from tkinter import Tk
+        from view import GameView
+        root = Tk()
+        view = GameView(root, game, [])
+        view.pack()
+        root.update()
+    if headless: game._Game__view = view # setview only takes a GameView
+    else: game.setview(view)
+
+    game.open(*start) # generate data once
+    opened = game.mode.num_safes - game.safes_left
+    print(f'{h}x{w}, {mines} mines, {opened} squares per click')
+
+    results = {}
+    results['batched'] = click_latency(root, game, start, 10), \
+        headless and flushes(view, game, start)
+    Game.batch = unbatched
+    results['per cell'] = click_latency(root, game, start, 10), \
+        headless and flushes(view, game, start)
+    for name in ('per cell', 'batched'):
+        (best, mean), n = results[name]
+        line = f'{name:10}best {best*1e3:7.1f}ms   mean {mean*1e3:7.1f}ms'
+        if headless: line += f'   {n} flushes'
+        print(line)
+    if not headless: root.destroy()
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
+import sys
 from src.gui import GUI
 
-gui = GUI()
+gui = GUI(stats='--stats' in sys.argv)
 gui.start()
\ No newline at end of file
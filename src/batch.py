@@ -0,0 +1,144 @@
+'''Headless generation of no-guess boards in bulk'''
+from game import Game, Mode, MODES
+from library import LibraryWriter
+from stats import SolverStats
+
+import argparse
+import json
+import random
+from collections import Counter
+from math import ceil
+from multiprocessing import Pool
+from time import perf_counter
+
+def generate_one(mode:Mode, start:tuple[int,int], seed:int,
+        stats:bool=False):
+    '''Generate a board from seed, return it as a dict'''
+    t = perf_counter()
+    game = Game(mode, rng=random.Random(seed), stats=stats)
+    game.open(*start)
+    elapsed = perf_counter() - t
+
+    ret = {
+        'mode': [mode.height, mode.width, mode.mines],
+        'start': list(start),
+        'seed': seed,
+        'mines': game.mine_coords,
+        'time': elapsed,
+        'counts': dict(game.gen_counts),
+    }
+    if stats: ret['stats'] = game.gen_stats.as_dict()
+    return ret
+
+def _generate_one(args):
+    return generate_one(*args)
+
+def generate(mode:Mode, start:tuple[int,int], n:int, *,
+        workers:int|None=None, seed:int=0, stats:bool=False):
+    '''Yield n boards as they finish, board i is generated from seed+i'''
+    jobs = ((mode, start, seed+i, stats) for i in range(n))
+    if workers == 1: # no pool, easier to profile
+        yield from map(_generate_one, jobs)
+        return
+
+    with Pool(workers) as pool:
+        yield from pool.imap_unordered(_generate_one, jobs)
+
+def percentile(values:list[float], p:float):
+    '''Nearest-rank percentile of sorted values'''
+    assert values
+    k = max(0, min(len(values)-1, ceil(p/100*len(values))-1))
+    return values[k]
+
+class _JsonWriter:
+    def __init__(self, path:str):
+        self._f = open(path, 'w')
+
+    def write(self, board:dict):
+        self._f.write(json.dumps(board) + '\n')
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+class _LibraryWriter:
+    def __init__(self, path:str, mode:Mode):
+        self._writer = LibraryWriter(path, mode)
+
+    def write(self, board:dict):
+        self._writer.append(board['mines'], board['start'])
+        self._writer.flush()
+
+    def close(self):
+        self._writer.close()
+
+def run(mode:Mode, start:tuple[int,int], n:int, out:str, *,
+        workers:int|None=None, seed:int=0, fmt:str='jsonl',
+        stats:bool=False):
+    '''Stream n boards to out, as JSON lines or appended to a board
+    library (fmt='lib', see library.py), return a summary'''
+    times:list[float] = []
+    counts:Counter[str] = Counter()
+    total = SolverStats() # of all boards, if stats
+
+    writer = _LibraryWriter(out, mode) if fmt == 'lib' \
+        else _JsonWriter(out)
+    t = perf_counter()
+    try:
+        for board in generate(mode, start, n,
+                workers=workers, seed=seed, stats=stats):
+            writer.write(board)
+            times.append(board['time'])
+            counts.update(board['counts'])
+            if stats: total.merge(SolverStats.from_dict(board['stats']))
+    finally: writer.close()
+    elapsed = perf_counter() - t
+
+    times.sort()
+    ret = {
+        'boards': n,
+        'elapsed': elapsed,
+        'boards_per_sec': n/elapsed,
+        'latency': {f'p{p}': percentile(times, p) for p in (50, 90, 99)},
+        'counts': {k: counts[k] for k in ('modify', 'dig', 'restart')},
+    }
+    if stats: ret['stats'] = total
+    return ret
+
+def main(argv:list[str]|None=None):
+    parser = argparse.ArgumentParser(
+        description='Generate no-guess boards headlessly')
+    parser.add_argument('n', type=int, help='number of boards')
+    parser.add_argument('-m', '--mode', default='Expert',
+        help=f'one of {", ".join(MODES)}, or HEIGHTxWIDTHxMINES')
+    parser.add_argument('-s', '--start', type=int, nargs=2,
+        metavar=('ROW', 'COL'), help='first click, default is center')
+    parser.add_argument('-o', '--out', default='boards.jsonl')
+    parser.add_argument('-f', '--format', choices=('jsonl', 'lib'),
+        default='jsonl', help='lib appends to a binary board library')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+        help='processes, default is cpu count')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stats', action='store_true',
+        help='time the solver phases (kept per board in jsonl)')
+    args = parser.parse_args(argv)
+
+    if args.mode in MODES:
+        mode = MODES[args.mode]
+    else:
+        mode = Mode(*map(int, args.mode.lower().split('x')))
+    start = tuple(args.start) if args.start \
+        else (mode.height//2, mode.width//2)
+
+    summary = run(mode, start, args.n, args.out,
+        workers=args.workers, seed=args.seed, fmt=args.format,
+        stats=args.stats)
+
+    latency = summary['latency']
+    print(f'{summary["boards"]} boards in {summary["elapsed"]:.2f}s '
+        f'({summary["boards_per_sec"]:.2f} boards/sec)')
+    print('latency ' + ', '.join(
+        f'{p}={v*1000:.0f}ms' for p,v in latency.items()))
+    print('counts ' + ', '.join(
+        f'{k}={v}' for k,v in summary['counts'].items()))
+    if args.stats: print(summary['stats'])
\ No newline at end of file
@@ -1,3 +1,37 @@
+# lookup tables over the 512 masks of a 3x3 window
+def _norm(mask:int):
+    '''Shift mask so that its first row and col are not empty'''
+    dr, dc = 0, 0
+    while not mask & (1|2|4):
+        dr += 1
+        mask >>= 3
+    while not mask & (1|8|64):
+        dc += 1
+        mask >>= 1
+    return dr, dc, mask
+
+def _align(dr:int, dc:int, mask:int):
+    '''Move mask by dr rows and dc cols, dropping what falls outside'''
+    ret = 0
+    for bit in range(9):
+        if not mask & 1<<bit: continue
+        r, c = bit//3 + dr, bit%3 + dc
+        if 0 <= r < 3 and 0 <= c < 3:
+            ret |= 1 << r*3+c
+    return ret
+
+# NORM[mask]: (row shift, col shift, normalised mask)
+NORM = [None] + [_norm(mask) for mask in range(1, 512)]
+# ALIGN[dr+2][dc+2][mask]: mask of an equation anchored at (dr,dc)
+# relative to another one, seen in the other's frame
+ALIGN = [[[_align(dr, dc, mask) for mask in range(512)]
+    for dc in range(-2, 3)] for dr in range(-2, 3)
+]
+# VARS[mask]: (row, col) offsets of variables
+VARS = [tuple((bit//3, bit%3) for bit in range(9) if mask & 1<<bit)
+    for mask in range(512)
+]
+
 class EQN:
     def __init__(self, sr:int, sc:int, mask:int, mines:int):
         # cannot have 0 or > 9 vars
@@ -5,12 +39,9 @@ class EQN:
 
         # adjust so that sr and sc are
         # min row and col of variables in equation
-        while not mask & (1|2|4):
-            sr += 1
-            mask >>= 3
-        while not mask & (1|8|64):
-            sc += 1
-            mask >>= 1
+        dr, dc, mask = NORM[mask]
+        sr += dr
+        sc += dc
 
         self._sr, self._sc = sr, sc
         self._mask = mask
@@ -18,45 +49,26 @@ class EQN:
         assert mines >= 0
         self._mines = mines
 
+        # fields are read-only, so the hash never changes
+        self._hash = hash((sr, sc, mask))
+
     def munge(self, other:'EQN', diff:bool):
         '''Return intersection/difference mask of self vs other'''
         assert isinstance(other, EQN)
-        sr, sc, mask = other.sr, other.sc, other.mask
-
-        if abs(sr-self.sr) >= 3 or abs(sc-self.sc) >= 3:
-            mask = 0
-        else:
-            while sc < self.sc:
-                mask &= (1|8|64)^511
-                mask >>= 1
-                sc += 1
-            while sc > self.sc:
-                mask &= (4|32|256)^511
-                mask <<= 1
-                sc -= 1
-            while sr < self.sr:
-                mask &= (1|2|4)^511
-                mask >>= 3
-                sr += 1
-            while sr > self.sr:
-                mask &= (64|128|256)^511
-                mask <<= 3
-                sr -= 1
+        # fields are read directly, this is the innermost call
+        dr, dc = other._sr-self._sr, other._sc-self._sc
+
+        if -3 < dr < 3 and -3 < dc < 3:
+            mask = ALIGN[dr+2][dc+2][other._mask]
+        else: mask = 0
 
         if diff: mask ^= 511 # invert
-        return self.mask & mask
+        return self._mask & mask
 
     @property
     def vars_pos(self):
-        bit = 1
-        ret:list[tuple[int,int]] = []
-        for dr in range(3):
-            for dc in range(3):
-                if self.mask & bit:
-                    ret.append((self.sr+dr, self.sc+dc))
-                bit <<= 1
-
-        return ret
+        sr, sc = self._sr, self._sc
+        return [(sr+dr, sc+dc) for dr, dc in VARS[self._mask]]
 
     def __eq__(self, other:'EQN'):
         if self.sr == other.sr \
@@ -66,6 +78,9 @@ class EQN:
             return True
         return False
 
+    def __hash__(self):
+        return self._hash
+
     def __str__(self) -> str:
         s = ''
         s += f'pos:{self.sr,self.sc}, '
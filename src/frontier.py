@@ -0,0 +1,166 @@
+'''Exact deduction over the frontier: the squares of the equations are
+split into independent components, the mine assignments of each are
+enumerated, then combined under the number of mines left'''
+from eqn import EQN
+
+BUDGET = 100_000 # search nodes per component, past it nothing is deduced
+MAX_CELLS = 400 # keeps the recursion well within the default limit
+
+class Deduction:
+    '''Squares forced by the equations and the mines left. Interior
+    squares (unopened, not in any equation) are all safe or all mines
+    when interior_safe/interior_mine'''
+    def __init__(self, frontier:set[tuple[int,int]]):
+        self.frontier = frontier
+        self.safes:list[tuple[int,int]] = []
+        self.mines:list[tuple[int,int]] = []
+        self.interior_safe = False
+        self.interior_mine = False
+
+    def __bool__(self):
+        return bool(self.safes or self.mines
+            or self.interior_safe or self.interior_mine)
+
+class _Component:
+    def __init__(self, cells:list[tuple[int,int]], cons:list[tuple[int,int]]):
+        self.cells = cells
+        self.cons = cons # (mask over cells, mines)
+        # mines -> [cells mine in some assignment, cells safe in some]
+        self.table:dict[int, list[int]] = {}
+        self.solved = False
+
+    @property
+    def counts(self):
+        '''Bitset of possible numbers of mines'''
+        if not self.solved: return (1 << len(self.cells)+1) - 1
+        ret = 0
+        for k in self.table: ret |= 1 << k
+        return ret
+
+    def solve(self):
+        n = len(self.cells)
+        if n > MAX_CELLS: return
+        full = (1 << n) - 1
+        cell_cons:list[list[int]] = [[] for _ in range(n)]
+        need, left = [], []
+        for j, (mask, mines) in enumerate(self.cons):
+            need.append(mines)
+            left.append(mask.bit_count())
+            i = 0
+            while mask:
+                if mask & 1: cell_cons[i].append(j)
+                mask >>= 1
+                i += 1
+
+        table = self.table
+        nodes = 0
+        def search(i:int, k:int, assign:int):
+            nonlocal nodes
+            nodes += 1
+            if nodes > BUDGET: raise _OverBudget
+            if i == n:
+                t = table.get(k)
+                if t is None: table[k] = [assign, full ^ assign]
+                else:
+                    t[0] |= assign
+                    t[1] |= full ^ assign
+                return
+
+            js = cell_cons[i]
+            for mine in (0, 1):
+                ok = True
+                for j in js:
+                    left[j] -= 1
+                    need[j] -= mine
+                    if need[j] < 0 or need[j] > left[j]: ok = False
+                if ok: search(i+1, k+mine, assign | mine << i)
+                for j in js:
+                    left[j] += 1
+                    need[j] += mine
+
+        try:
+            search(0, 0, 0)
+            self.solved = True
+        except _OverBudget: table.clear()
+
+class _OverBudget(Exception): pass
+
+def _components(eqns:list[EQN]):
+    owner:dict[tuple[int,int], int] = {} # square -> eqn index
+    parent = list(range(len(eqns)))
+    def find(i:int):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, e in enumerate(eqns):
+        for pos in e.vars_pos:
+            j = owner.setdefault(pos, i)
+            if j != i: parent[find(i)] = find(j)
+
+    groups:dict[int, list[int]] = {}
+    for i in range(len(eqns)): groups.setdefault(find(i), []).append(i)
+
+    for group in groups.values():
+        index:dict[tuple[int,int], int] = {}
+        cons = []
+        # squares numbered in order of appearance, so neighbors in
+        # the search share equations and prune early
+        for i in group:
+            mask = 0
+            for pos in eqns[i].vars_pos:
+                mask |= 1 << index.setdefault(pos, len(index))
+            cons.append((mask, eqns[i].mines))
+        yield _Component(list(index), cons)
+
+def _add(a:int, b:int, cap:int):
+    '''Bitset of sums of a number in a and one in b, up to cap'''
+    ret = 0
+    while b:
+        low = b & -b
+        ret |= a << low.bit_length()-1
+        b ^= low
+    return ret & (1 << cap+1) - 1
+
+def deduce(eqns:list[EQN], mines_left:int, squares_left:int):
+    '''Deduction on unopened squares, given equations over them, mines
+    left and the number of unopened unflagged squares'''
+    comps = list(_components(eqns))
+    frontier = {pos for comp in comps for pos in comp.cells}
+    ret = Deduction(frontier)
+    for comp in comps: comp.solve()
+
+    interior = squares_left - len(frontier)
+    lo = max(0, mines_left - interior)
+
+    # sums over components before/after each one
+    prefix = [1]
+    for comp in comps: prefix.append(_add(prefix[-1], comp.counts, mines_left))
+    suffix = [1]
+    for comp in reversed(comps):
+        suffix.append(_add(suffix[-1], comp.counts, mines_left))
+    suffix.reverse()
+
+    window = (1 << mines_left+1) - (1 << lo) # totals leaving a valid interior
+    if not prefix[-1] & window: return ret # inconsistent, deduce nothing
+
+    for c, comp in enumerate(comps):
+        if not comp.solved: continue
+        others = _add(prefix[c], suffix[c+1], mines_left)
+        can_mine = can_safe = 0
+        for k, (mine, safe) in comp.table.items():
+            # k is possible if the others can make up the window
+            if others & (window >> k):
+                can_mine |= mine
+                can_safe |= safe
+        for i, pos in enumerate(comp.cells):
+            if not can_mine >> i & 1: ret.safes.append(pos)
+            elif not can_safe >> i & 1: ret.mines.append(pos)
+
+    if interior > 0:
+        totals = prefix[-1] & window
+        # interior holds mines_left - total mines
+        ret.interior_safe = totals == 1 << mines_left
+        ret.interior_mine = totals == 1 << lo and lo == mines_left-interior
+    return ret
\ No newline at end of file
@@ -1,5 +1,8 @@
-from helper import Board, vicinity
+from helper import Board, ArrayBoard, IndexedSet, vicinity, shuffled_union
 from enum import Enum
+from contextlib import contextmanager
+from collections import OrderedDict
+from itertools import chain
 import random
 
 class Mode:
@@ -32,6 +35,13 @@ class Mode:
         and self.width == other.width \
         and self.mines == other.mines \
 
+MODES = OrderedDict([
+    ('Easy', Mode(9,9, 10)),
+    ('Medium', Mode(16,16, 40)),
+    ('Hard', Mode(16,30, 99)),
+    ('Expert', Mode(20,30, 180)),
+])
+
 class Item(Enum):
     ZERO = 0
     ONE = 1
@@ -63,92 +73,283 @@ class GameState(Enum):
     WIN = 1
     LOSE = -1
 
+# kinds of journal entries
+_FIELD, _DATA, _COUNTERS = range(3)
+
 class Game:
-    def __init__(self, mode:Mode):
+    def __init__(self, mode:Mode, *, array:bool=False,
+            rng:random.Random|None=None, stats:bool=False):
         self._mode = mode
-        self._data = Board(mode.height, mode.width, 0)
+        self._stats = stats # collect SolverStats when generating
+        # source of all randomness, the random module if not given
+        self._rng = rng if rng is not None else random
+        # array: numpy backed data, counted with array operations
+        board = ArrayBoard if array else Board
+        self._data = board(mode.height, mode.width, 0)
         self._field = Board(mode.height, mode.width, Item.UNOPEN)
 
+        # cells that left their initial state, so that restart
+        # only has to reset those
+        self._played:set[tuple[int,int]] = set() # field not UNOPEN
+        self._mines:set[tuple[int,int]] = set() # data is -1
+
+        # unopened squares for modify: near touches a revealed square,
+        # far does not and is split by whether it is a mine
+        # revealed squares in the 3x3 around each square, row major
+        self._around = [0]*(mode.height*mode.width)
+        self._near = IndexedSet()
+        self._far_safes = IndexedSet(self._field.all_coords)
+        self._far_mines = IndexedSet()
+        # for dig: flags next to a revealed and an unopened square,
+        # unopened squares that are not mines
+        self._unopen_around = [0]*(mode.height*mode.width) # unopened 3x3
+        h, w = mode.height, mode.width
+        for r,c in self._field.all_coords:
+            self._unopen_around[r*w+c] = \
+                (min(r+2, h)-max(r-1, 0)) * (min(c+2, w)-max(c-1, 0))
+        self._flags:set[tuple[int,int]] = set()
+        self._dig_flags = IndexedSet()
+        self._hidden_safes = IndexedSet(self._field.all_coords)
+
         self._mines_left = mode.mines
         self._safes_left = mode.num_safes
 
         self._start_coord = None
         self._state = GameState.PLAY
-
-    def _gen_data(self, sr:int, sc:int):
+        self.__view = None
+        self._gen_counts = None # solver counts of last generation
+        self._gen_stats = None # and its SolverStats, if enabled
+        # (row, col, ismine) of the last modify/dig
+        self._last_changes:list[tuple[int,int,bool]] = []
+        # (kind, ...) entries to undo changes, None when not journaling
+        self._journal:list[tuple]|None = None
+
+    @classmethod
+    def from_record(cls, mode:Mode, record:bytes, **kwargs):
+        '''Game on a board stored as a library record (see library.py)'''
+        from library import unpack
+        game = cls(mode, **kwargs)
+        game.load(*unpack(mode, record))
+        return game
+
+    def generate(self, row:int, col:int, cancel:'Event|None'=None):
+        '''Generate a layout solvable from row,col without opening it,
+        raise solver.Cancelled once cancel is set'''
+        assert not self._start_coord
+        self._gen_data(row, col, cancel)
+
+    def _gen_data(self, sr:int, sc:int, cancel:'Event|None'=None):
         viable_coords = [
             (r,c) for r,c in self._data.all_coords
             if abs(r-sr) > 1 or abs(c-sc) > 1
         ]
-        mines_coords = random.sample(viable_coords, self.mode.mines)
-
-        for r,c in mines_coords:
-            self._data[r,c] = -1
-            for i,j in vicinity(r,c):
-                if not self._data.valid_bound(i,j): continue
-                if self._data[i,j] == -1: continue
-                self._data[i,j] += 1
-
+        mines_coords = self._rng.sample(viable_coords, self.mode.mines)
+        self._place_mines(mines_coords)
         self._start_coord = sr,sc
 
-        # temporarily remove game view
+        # temporarily remove game view, generation is not journaled
         view = self.__view
         self.__view = None
+        journal, self._journal = self._journal, None
 
         # using solver to ensure solvability
         from solver import Solver
-        solver = Solver(self)
-        solver.solve()
-
-        # reset and regain view
+        from stats import SolverStats
+        solver = Solver(self, stats=SolverStats() if self._stats else None,
+            cancel=cancel)
+        try: solver.solve()
+        finally:
+            # reset and regain view
+            self._gen_counts = solver.counts
+            self._gen_stats = solver.stats
+            self.restart(False)
+            self.__view = view
+            self._journal = journal
+
+    def _place_mines(self, mines_coords:list[tuple[int,int]]):
+        if isinstance(self._data, ArrayBoard):
+            self._data.place_mines(mines_coords)
+            for r,c in mines_coords: self._mark_mine(r,c, True)
+        else:
+            for r,c in mines_coords:
+                self._set_data(r,c, -1)
+                for i,j in vicinity(r,c):
+                    if not self._data.valid_bound(i,j): continue
+                    if self._data[i,j] == -1: continue
+                    self._data[i,j] += 1
+
+    def load(self, mines_coords:list[tuple[int,int]], start:tuple[int,int],
+            gen_stats:'SolverStats|None'=None):
+        '''Use a ready-made layout, solvable from start, instead of
+        generating one on the first open. Flags placed before are
+        cleared, as generating would'''
+        assert not self._start_coord
+        assert len(mines_coords) == self.mode.mines
         self.restart(False)
-        self.__view = view
+        self._place_mines(mines_coords)
+        self._start_coord = start
+        self._gen_stats = gen_stats
+
+    def _set_data(self, row:int, col:int, v:int):
+        self._data[row,col] = v
+        self._mark_mine(row, col, v == -1)
+
+    def _mark_mine(self, row:int, col:int, ismine:bool):
+        '''Keep mine trackers in step with data'''
+        pos = row,col
+        if ismine: self._mines.add(pos)
+        else: self._mines.discard(pos)
+
+        if pos in self._far_safes or pos in self._far_mines:
+            self._far_safes.discard(pos)
+            self._far_mines.discard(pos)
+            self._far_set(pos).add(pos)
+        if pos not in self._played:
+            if ismine: self._hidden_safes.discard(pos)
+            else: self._hidden_safes.add(pos)
+
+    def _far_set(self, pos:tuple[int,int]):
+        return self._far_mines if pos in self._mines else self._far_safes
 
     def _adjust(self, row:int, col:int, item:Item):
-        if self._field[row,col] is item: return
+        old = self._field[row,col]
+        if old is item: return
         self._field[row,col] = item
-        try:
-            self.__view.adjust_grid(row, col, item)
-            self.__view.update()
+        if self._journal is not None:
+            self._journal.append((_FIELD, row, col, old))
+
+        if item is Item.UNOPEN: self._played.discard((row,col))
+        else: self._played.add((row,col))
+        self._track(row, col, old, item)
+        try: self.__view.adjust_grid(row, col, item)
         except: pass
 
+    def _track(self, row:int, col:int, old:Item, item:Item):
+        '''Keep near/far and dig candidate sets in step with the field'''
+        pos = row,col
+        if old is Item.UNOPEN:
+            self._near.discard(pos)
+            self._far_set(pos).discard(pos)
+            self._hidden_safes.discard(pos)
+        if old is Item.FLAG: self._flags.discard(pos)
+        elif item is Item.FLAG: self._flags.add(pos)
+
+        h, w = self.mode.height, self.mode.width
+        around, unopen, played = self._around, self._unopen_around, self._played
+        d = (item.value >= 0) - (old.value >= 0) # revealed or hidden
+        du = (item is Item.UNOPEN) - (old is Item.UNOPEN)
+        if d or du:
+            for i in range(max(row-1, 0), min(row+2, h)):
+                for j in range(max(col-1, 0), min(col+2, w)):
+                    k = i*w+j
+                    unopen[k] += du
+                    n = around[k]
+                    around[k] = n+d
+                    if (i,j) == pos: continue
+                    if (i,j) in self._flags:
+                        self._check_flag(i,j)
+                        continue
+
+                    # unopened squares cross between near and far
+                    if n and n+d or not d or (i,j) in played: continue
+                    if n == 0:
+                        self._far_set((i,j)).discard((i,j))
+                        self._near.add((i,j))
+                    else:
+                        self._near.discard((i,j))
+                        self._far_set((i,j)).add((i,j))
+
+        if item is Item.UNOPEN:
+            if around[row*w+col]: self._near.add(pos)
+            else: self._far_set(pos).add(pos)
+            if pos not in self._mines: self._hidden_safes.add(pos)
+        self._check_flag(row, col)
+
+    def _check_flag(self, row:int, col:int):
+        '''A flag can be dug if it touches a revealed and an unopened
+        square'''
+        k = row*self.mode.width+col
+        if (row,col) in self._flags \
+        and self._around[k] and self._unopen_around[k]:
+            self._dig_flags.add((row,col))
+        else: self._dig_flags.discard((row,col))
+
+    @contextmanager
+    def batch(self):
+        '''Collect view changes made inside, paint them in one pass'''
+        view = self.__view
+        if view is None:
+            yield
+            return
+
+        view.begin()
+        try: yield
+        finally: view.commit()
+
     def _valid_action(self, row:int, col:int):
         return self._state is GameState.PLAY \
         and self._field.valid_bound(row,col)
 
     def open(self, row:int, col:int, auto:bool=True):
+        if auto: return bool(self.flood(row,col))
+        if not self._prepare(row,col): return False
+        with self.batch(): self._reveal(row,col)
+        return True
+
+    def flood(self, row:int, col:int):
+        '''Open row,col then, iteratively, the squares around every
+        revealed ZERO. Return the set of revealed squares'''
+        if not self._prepare(row,col): return set()
+
+        revealed:set[tuple[int,int]] = set()
+        stack = [(row,col)]
+        with self.batch():
+            while stack:
+                r,c = stack.pop()
+                if self._field[r,c] is not Item.UNOPEN: continue
+                self._reveal(r,c)
+                revealed.add((r,c))
+
+                if self._state is not GameState.PLAY: break
+                if self._field[r,c] is not Item.ZERO: continue
+                for i,j in vicinity(r,c):
+                    if self._field.valid_bound(i,j) \
+                    and self._field[i,j] is Item.UNOPEN:
+                        stack.append((i,j))
+        return revealed
+
+    def _prepare(self, row:int, col:int):
+        '''Whether row,col can be opened, generate data on first open'''
         if not self._valid_action(row,col): return False
         if self._field[row,col] is not Item.UNOPEN: return False
+        self._save_counters()
         if not self._start_coord: self._gen_data(row,col)
+        return True
 
+    def _reveal(self, row:int, col:int):
+        '''Open an unopen square, handle lose/win'''
         if self._data[row,col] == -1: # lose
             self._adjust(row, col, Item.BOMB)
-            for r,c in self._field.all_coords:
-                if self._field[r,c] is Item.FLAG \
-                and self._data[r,c] != -1:
-                    self._adjust(r,c, Item.BADFLAG)
+            for r,c in sorted(self._flags - self._mines):
+                self._adjust(r,c, Item.BADFLAG)
             self._state = GameState.LOSE
-        else:
-            self._adjust(row, col, Item(self._data[row,col]))
-            self._safes_left -= 1
+            return
 
-            assert self.safes_left >= 0
-            if self.safes_left == 0: # win
-                for r,c in self._field.all_coords:
-                    self.flag(r,c)
-                self._state = GameState.WIN
+        self._adjust(row, col, Item(self._data[row,col]))
+        self._safes_left -= 1
 
-            # auto open around ZERO
-            if auto and self._field[row,col] is Item.ZERO:
-                for r,c in vicinity(row,col):
-                    self.open(r,c)
-        return True
+        assert self.safes_left >= 0
+        if self.safes_left == 0: # win
+            for r,c in self.unopen_coords:
+                self.flag(r,c)
+            self._state = GameState.WIN
 
     def flag(self, row:int, col:int):
         if not self._valid_action(row,col): return False
         if self._field[row,col] is not Item.UNOPEN: return False
         if self._mines_left <= 0: return False
 
+        self._save_counters()
         self._adjust(row, col, Item.FLAG)
         self._mines_left -= 1
         return True
@@ -157,6 +358,7 @@ class Game:
         if not self._valid_action(row,col): return False
         if self._field[row,col] is not Item.FLAG: return False
 
+        self._save_counters()
         self._adjust(row, col, Item.UNOPEN)
         self._mines_left += 1
         return True
@@ -177,17 +379,19 @@ class Game:
 
         if len(unopens) == 0: return False # nothing to do
         if mines_left == 0:
-            for r,c in vicinity(row,col):
-                self.open(r,c)
+            with self.batch():
+                for r,c in vicinity(row,col):
+                    self.open(r,c)
         elif mines_left == len(unopens):
-            for r,c in vicinity(row,col):
-                self.flag(r,c)
+            with self.batch():
+                for r,c in vicinity(row,col):
+                    self.flag(r,c)
         else: return False # not a trivial case
         return True
 
     def restart(self, new:bool=True):
-        for r,c in self._field.all_coords:
-            self._adjust(r,c, Item.UNOPEN)
+        self._journal = None # nothing to roll back to
+        with self.batch(): self._reset_field()
 
         self._mines_left = self.mode.mines
         self._safes_left = self.mode.num_safes
@@ -195,8 +399,57 @@ class Game:
 
         if new:
             self._start_coord = None
-            for r,c in self._data.all_coords:
-                self._data[r,c] = 0
+            self._gen_counts = self._gen_stats = None
+            # only mines and their neighbors are not 0
+            dirty = {(i,j) for r,c in self._mines
+                for i,j in vicinity(r,c)
+                if self._data.valid_bound(i,j)
+            }
+            for r,c in dirty: self._set_data(r,c, 0)
+
+    def unplay(self, coords:list[tuple[int,int]]):
+        '''Turn opened/flagged squares back to unopened, keeping the
+        counters right (used by the solver to roll back)'''
+        self._save_counters()
+        with self.batch():
+            for r,c in coords:
+                item = self._field[r,c]
+                if item is Item.UNOPEN: continue
+                if item is Item.FLAG: self._mines_left += 1
+                else: self._safes_left += 1
+                self._adjust(r,c, Item.UNOPEN)
+
+    def savepoint(self):
+        '''Start journaling changes to field, data and counters, return
+        a mark to roll back to. restart() ends the journal'''
+        if self._journal is None: self._journal = []
+        return len(self._journal)
+
+    def rollback(self, mark:int):
+        '''Undo the changes made since savepoint mark, in time
+        proportional to their number'''
+        journal = self._journal
+        assert journal is not None and mark <= len(journal)
+        self._journal = None # undoing is not journaled
+        with self.batch():
+            while len(journal) > mark:
+                kind, a, b, c = journal.pop()
+                if kind == _FIELD: self._adjust(a, b, c)
+                elif kind == _DATA: self._set_data(a, b, c)
+                else: self._mines_left, self._safes_left, self._state = a,b,c
+        self._journal = journal
+
+    def release(self):
+        '''Stop journaling'''
+        self._journal = None
+
+    def _save_counters(self):
+        if self._journal is not None: self._journal.append((_COUNTERS,
+            self._mines_left, self._safes_left, self._state))
+
+    def _reset_field(self):
+        for r,c in list(self._played):
+            self._adjust(r,c, Item.UNOPEN)
 
     def item_at(self, row:int, col:int) -> Item|None:
         return self._field[row,col] \
@@ -211,6 +464,13 @@ class Game:
     def field_coords(self):
         return self._field.all_coords
 
+    @property
+    def unopen_coords(self):
+        '''Coordinates of unopened squares, safe to open/flag while
+        iterating'''
+        # row major, like a scan of the field
+        return sorted((*self._near, *self._far_safes, *self._far_mines))
+
     @property
     def mines_left(self):
         return self._mines_left
@@ -231,12 +491,34 @@ class Game:
     def start_coord(self):
         return self._start_coord
 
+    @property
+    def rng(self):
+        return self._rng
+
+    @property
+    def mine_coords(self):
+        return sorted(self._mines)
+
+    @property
+    def gen_counts(self):
+        return self._gen_counts
+
+    @property
+    def gen_stats(self):
+        return self._gen_stats
+
+    @property
+    def collects_stats(self):
+        return self._stats
+
+    @property
+    def last_changes(self):
+        return self._last_changes
+
     # functions for modify data (requested by solver)
     def modify(self, store):
         '''Swap mines in unknown squares to make an eqn from store trivial'''
-        from store import Store, EQN
-        assert isinstance(store, Store)
-
+        # store is a store.Store or another backend with its interface
         eqn = store.pick()
         if not eqn: return False
 
@@ -253,30 +535,17 @@ class Game:
 
         # get candidates to swap with full/clear above, must be unopen
         # prioritize 'near' squares, which has contact with known squares
-        near, far = [], []
-        for r,c in self._field.all_coords:
-            if eqn.munge(EQN(r,c,1,0), False): continue
-            if self._field[r,c] is not Item.UNOPEN: continue
-
-            isnear = False
-            for i,j in vicinity(r,c):
-                if not self._field.valid_bound(i,j): continue
-                v = self._field[i,j].value
-                if v >= 0:
-                    assert v > 0
-                    isnear = True
-                    break
-
-            if isnear: near.append((r,c))
-            else: far.append((r,c))
-
-        random.shuffle(near)
-        if not near:
+        # drawn lazily from the sets kept by _track
+        eqn_vars = set(eqn.vars_pos)
+        if len(self._near) > sum(pos in self._near for pos in eqn_vars):
+            far = shuffled_union(self._rng, self._far_safes, self._far_mines)
+        else:
             # prioritize empty the set
-            far.sort(key=lambda pos:-self._data[pos]) # why?
-        else: random.shuffle(far)
-
-        usable = near + far
+            far = sorted(self._far_safes, key=lambda pos:-self._data[pos]) \
+                + list(self._far_mines) # why?
+        usable = (pos for pos in chain(self._near.shuffled(self._rng), far)
+            if pos not in eqn_vars
+        )
 
         # get list of squares to be filled/emptied
         # full squares fill in filled squares
@@ -304,26 +573,25 @@ class Game:
         changes.extend((*pos, False) for pos in old)
         changes.extend((*pos, True) for pos in new)
 
-        # update equations in store
-        for r,c, ismine in changes:
-            d = 1 if ismine else -1
-            e0 = EQN(r,c,1,0)
-            for i in store.get_overlap(e0):
-                e1 = store.get_eqn(i)
-                store.remove(i)
-
-                new_mines = e1.mines + d
-                new_eqn = EQN(e1.sr, e1.sc, e1.mask, new_mines)
-                store.add(new_eqn)
-            store.clean()
-
+        shift_eqns(store, changes)
         self.__apply(changes)
         return True
 
     def __apply(self, changes:list[tuple[int,int,bool]]):
         '''Adjust data and field on changes'''
+        self._last_changes = changes
+        if self._journal is not None:
+            touched = {(i,j) for r,c,_ in changes for i,j in vicinity(r,c)
+                if self._data.valid_bound(i,j)
+            }
+            self._journal.extend((_DATA, r, c, self._data[r,c])
+                for r,c in touched)
+        if isinstance(self._data, ArrayBoard):
+            self.__apply_array(changes)
+            return
+
         for r,c, ismine in changes:
-            self._data[r,c] = -1 if ismine else -2
+            self._set_data(r,c, -1 if ismine else -2)
 
             d = 1 if ismine else -1
             for i,j in vicinity(r,c):
@@ -339,44 +607,47 @@ class Game:
         for r,c, ismine in changes:
             if ismine: continue
             assert self._data[r,c] == -2
-            v = 0
-            for i,j in vicinity(r,c):
-                if self._data.valid_bound(i,j) \
-                and self._data[i,j] == -1:
-                    v += 1
-            self._data[r,c] = v
+            mines = self._mines
+            self._set_data(r,c, sum(pos in mines for pos in vicinity(r,c)))
 
             # old mines can either be UNOPEN or FLAG
             # neither are important to adjust the field
 
-    def dig(self):
-        '''Replace a known flag by a unknown safe square'''
-        flags, safes = [], []
-        for r,c in self._field.all_coords:
-            if self._field[r,c] is Item.FLAG:
-                # make sure the flag connect between
-                # a safe known square and an unopen square
-                has_safe, has_unopen = False, False
-                for i,j in vicinity(r,c):
-                    if not self._field.valid_bound(i,j): continue
-                    if self._field[i,j] is Item.UNOPEN:
-                        has_unopen = True
-                    elif self._field[i,j].value >= 0:
-                        assert self._field[i,j].value > 0
-                        has_safe = True
-
-                    if has_safe and has_unopen:
-                        flags.append((r,c))
-                        break
+    def __apply_array(self, changes:list[tuple[int,int,bool]]):
+        recount = self._data.move_mines(changes)
+        for r,c, ismine in changes:
+            self._mark_mine(r,c, ismine)
 
-            elif self._field[r,c] is Item.UNOPEN \
-            and self._data[r,c] != -1:
-                safes.append((r,c))
+        # old mines can either be UNOPEN or FLAG
+        # neither are important to adjust the field
+        moved = {(r,c) for r,c,_ in changes}
+        for r,c in recount:
+            if (r,c) in moved: continue
+            if self._field[r,c] is not Item.UNOPEN:
+                self._adjust(r,c, Item(self._data[r,c]))
 
-        old = random.choice(flags)
-        new = random.choice(safes)
+    def dig(self):
+        '''Replace a known flag by a unknown safe square'''
+        # candidates are kept by _track and _mark_mine
+        old = self._dig_flags.choice(self._rng)
+        new = self._hidden_safes.choice(self._rng)
 
         changes:list[tuple[int,int,bool]] = [(*old, False), (*new, True)]
         self.__apply(changes)
 
-        return old # only need to return place of digged flag to solver
\ No newline at end of file
+        return old # only need to return place of digged flag to solver
+
+def shift_eqns(store, changes:list[tuple[int,int,bool]]):
+    '''Update the mines of equations in store over squares whose mine
+    was moved by changes'''
+    from eqn import EQN
+    for r,c, ismine in changes:
+        d = 1 if ismine else -1
+        e0 = EQN(r,c,1,0)
+        for i in store.get_overlap(e0):
+            e1 = store.get_eqn(i)
+            store.remove(i)
+
+            new_mines = e1.mines + d
+            new_eqn = EQN(e1.sr, e1.sc, e1.mask, new_mines)
+            store.add(new_eqn)
\ No newline at end of file
@@ -1,32 +1,37 @@
-from game import Game, Mode
+from game import Game, Mode, MODES
 from view import GameView
 from __init__ import EXE_DIR
 from helper import sec2min
+from pool import BoardPool
 
 import json
 from tkinter import *
 from tkinter import font
-from collections import OrderedDict
-
-MODES = OrderedDict([
-    ('Easy', Mode(9,9, 10)),
-    ('Medium', Mode(16,16, 40)),
-    ('Hard', Mode(16,30, 99)),
-    ('Expert', Mode(20,30, 180)),
-])
+
 RECORDS_FILE = EXE_DIR + 'src/records.json'
+POOL_SIZE = 5 # ready-made boards kept for the current mode
 
 class GUI:
-    def __init__(self):
+    def __init__(self, stats:bool=False):
+        self._stats = stats # time the solver when generating, for 'i'
         self._load_records()
         self._root = Tk()
         self._root.resizable(False,False)
         self._root.title('Mines')
         self._root.bind('s', lambda _: self._solve())
+        self._root.bind('i', lambda _: self._show_stats())
+        self._root.bind('<Control-z>', lambda _: self._gameview.undo())
+        # solver replay: pause, faster, slower, stop
+        self._root.bind('p', lambda _: self._gameview.pause_replay())
+        self._root.bind('+', lambda _: self._gameview.replay_speed(1))
+        self._root.bind('=', lambda _: self._gameview.replay_speed(1))
+        self._root.bind('-', lambda _: self._gameview.replay_speed(-1))
+        self._root.bind('<Escape>', lambda _: self._gameview.cancel_replay())
 
         self._mainframe = Frame(self._root)
         self._mainframe.pack()
 
+        self._pools:dict[str, BoardPool] = {}
         self._build_menu()
         self._build_config()
         self._build_game()
@@ -108,10 +113,16 @@ class GUI:
     def _build_game(self):
         mode = self._choice.get()
 
-        self._game = Game(MODES[mode])
+        # only fill the pool of the current mode
+        for pool in self._pools.values(): pool.stop()
+        if mode not in self._pools:
+            self._pools[mode] = BoardPool(MODES[mode], POOL_SIZE)
+        self._pools[mode].start()
+
+        self._game = Game(MODES[mode], stats=self._stats)
         self._gameview = GameView(
             self._mainframe, self._game,
-            self._records[mode]
+            self._records[mode], self._pools[mode]
         )
         self._game.setview(self._gameview)
         self._gameview.pack()
@@ -175,14 +186,36 @@ class GUI:
                     font=font.Font(size=10)
                 )
 
+    def _show_stats(self):
+        stats = self._game.gen_stats
+        if not self._stats: text = 'Start with --stats to collect them'
+        elif not self._game.start_coord: text = 'Not generated yet'
+        elif stats is None: text = 'Board taken from the pool'
+        else: text = str(stats)
+
+        top = Toplevel(self._root)
+        top.title('Generation stats')
+        top.resizable(False, False)
+        Label(top, text=text, justify=LEFT, padx=10, pady=10,
+            font=font.Font(family='Courier', size=10)
+        ).pack()
+
     def _solve(self):
+        game = self._game
+        if not game.start_coord: return
+
+        # solve a copy at full speed, then animate the recorded moves
         from solver import Solver
-        s = Solver(self._game, sleep_time=0.1)
-        s.solve()
+        copy = Game(game.mode)
+        copy.load(game.mine_coords, game.start_coord)
+        trace = []
+        Solver(copy, trace=trace).solve()
+        self._gameview.replay(trace)
 
     def start(self):
         self._root.mainloop()
 
     def _exit(self):
+        for pool in self._pools.values(): pool.stop()
         self._dump_records()
         self._root.destroy()
\ No newline at end of file
@@ -1,11 +1,18 @@
 from __init__ import EXE_DIR
-from PIL import Image
 import datetime
 import calendar
+from functools import cache
 from math import floor
 
+try: import numpy as np
+except ImportError: np = None # only needed by ArrayBoard
+
 IMG_DIR = EXE_DIR + 'images/'
+@cache
 def get_img(file:str, size:tuple[int,int]):
+    '''Image file scaled to size, scaled once per size'''
+    # imported here so that headless use does not need pillow
+    from PIL import Image
     return Image.open(IMG_DIR+file).resize(
         size, Image.LANCZOS)
 
@@ -51,6 +58,9 @@ BR = '\n'
 class Board:
     def __init__(self, h:int, w:int, default=None):
         self.__h, self.__w = h, w
+        self._alloc(default)
+
+    def _alloc(self, default):
         self.__data = [
             [default for _ in range(self.__w)]
             for _ in range(self.__h)
@@ -79,7 +89,7 @@ class Board:
 
         s += BR.join((
             f'{i%10:<{size}}' + WS.join((
-                f'{self.__data[i][j]:>{size}}'
+                f'{self[i,j]:>{size}}'
                 for j in range(self.__w)
             )) for i in range(self.__h)
         )) + BR
@@ -99,4 +109,137 @@ class Board:
 
     @property
     def width(self):
-        return self.__w
\ No newline at end of file
+        return self.__w
+
+# row/col offsets of a 3x3 window
+_DR = np.repeat(np.arange(-1, 2), 3) if np else None
+_DC = np.tile(np.arange(-1, 2), 3) if np else None
+
+class ArrayBoard(Board):
+    '''Board of ints backed by a numpy array'''
+    def __init__(self, h:int, w:int, default:int=0):
+        assert np, 'ArrayBoard needs numpy'
+        super().__init__(h, w, default)
+
+    def _alloc(self, default:int):
+        self._arr = np.full((self.height, self.width), default, np.int8)
+
+    def __getitem__(self, coord:tuple[int,int]):
+        r,c = coord
+        if not self.valid_bound(r,c):
+            raise IndexError(f'index out of range {r,c}')
+        return self._arr.item(r,c)
+
+    def __setitem__(self, coord:tuple[int,int], v:int):
+        r,c = coord
+        if not self.valid_bound(r,c):
+            raise IndexError(f'index out of range {r,c}')
+        self._arr[r,c] = v
+
+    def _count_around(self, mines:'np.ndarray'):
+        '''Number of True cells in each 3x3 window, by padded slices'''
+        h, w = self.height, self.width
+        padded = np.zeros((h+2, w+2), np.int8)
+        padded[1:-1,1:-1] = mines
+        return sum(padded[dr:dr+h, dc:dc+w]
+            for dr in range(3) for dc in range(3)
+        )
+
+    def place_mines(self, coords:list[tuple[int,int]]):
+        '''Set mines (-1) at coords and every other cell to its count'''
+        mines = np.zeros((self.height, self.width), np.bool_)
+        if coords: mines[tuple(zip(*coords))] = True
+        self._arr = np.where(mines, -1, self._count_around(mines)) \
+            .astype(np.int8)
+
+    def move_mines(self, changes:list[tuple[int,int,bool]]):
+        '''Add/remove mines on changes, recounting only the 3x3 windows
+        around them. Return coordinates of safe cells whose count changed'''
+        h, w = self.height, self.width
+        arr = self._arr.reshape(-1) # a view, flat index r*w+c
+        rows, cols, adds = (np.array(v) for v in zip(*changes))
+        moved = rows*w + cols
+        # removed mines are recounted last, keep them out of the way
+        arr[moved] = np.where(adds, -1, -2)
+
+        # neighbors of each change, with +1/-1 for an added/removed mine
+        nr = (rows[:,None] + _DR).ravel()
+        nc = (cols[:,None] + _DC).ravel()
+        cells = nr*w + nc
+        ok = (nr >= 0) & (nr < h) & (nc >= 0) & (nc < w)
+        ok[ok] = arr[cells[ok]] >= 0
+        cells = cells[ok]
+        before = arr[cells]
+        np.add.at(arr, cells, np.repeat(np.where(adds, 1, -1), 9)[ok])
+        ret = set(cells[arr[cells] != before].tolist())
+
+        freed = moved[~adds]
+        if len(freed):
+            nr = freed[:,None]//w + _DR
+            nc = freed[:,None]%w + _DC
+            ok = (nr >= 0) & (nr < h) & (nc >= 0) & (nc < w)
+            around = np.where(ok, arr[np.where(ok, nr*w + nc, 0)], 0)
+            arr[freed] = (around == -1).sum(axis=1)
+            ret.update(freed.tolist())
+        return [divmod(i, w) for i in ret]
+
+class IndexedSet:
+    '''Set with O(1) add, discard and random pick'''
+    def __init__(self, items=()):
+        self._items:list = []
+        self._pos:dict = {} # item -> index in _items
+        for item in items: self.add(item)
+
+    def add(self, item):
+        if item in self._pos: return
+        self._pos[item] = len(self._items)
+        self._items.append(item)
+
+    def discard(self, item):
+        i = self._pos.pop(item, None)
+        if i is None: return
+        last = self._items.pop()
+        if i < len(self._items):
+            self._items[i] = last
+            self._pos[last] = i
+
+    def choice(self, rng):
+        return self._items[rng.randrange(len(self._items))]
+
+    def shuffled(self, rng):
+        '''Yield the items in random order, one Fisher-Yates step at a
+        time, so stopping early is cheap. The set must not change
+        while iterating'''
+        items, pos = self._items, self._pos
+        for i in range(len(items)-1, -1, -1):
+            j = rng.randrange(i+1)
+            items[i], items[j] = items[j], items[i]
+            pos[items[i]], pos[items[j]] = i, j
+            yield items[i]
+
+    def copy(self):
+        ret = IndexedSet()
+        ret._items = self._items.copy()
+        ret._pos = self._pos.copy()
+        return ret
+
+    def __contains__(self, item):
+        return item in self._pos
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+def shuffled_union(rng, a:IndexedSet, b:IndexedSet):
+    '''Yield the items of two disjoint sets in random order'''
+    ia, ib = a.shuffled(rng), b.shuffled(rng)
+    na, nb = len(a), len(b)
+    while na or nb:
+        if rng.randrange(na+nb) < na:
+            na -= 1
+            yield next(ia)
+        else:
+            nb -= 1
+            yield next(ib)
\ No newline at end of file
@@ -0,0 +1,119 @@
+'''Compact board library: fixed-size binary records, read through mmap
+
+Layout (little endian):
+    header  magic 'MSLB', version u16, height u16, width u16, mines u32
+    record  start row u16, start col u16, mines bitset of height*width
+            bits (bit r*width+c), padded to whole bytes
+'''
+from game import Game, Mode
+
+import mmap
+import os
+import struct
+
+MAGIC = b'MSLB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHI')
+START = struct.Struct('<HH')
+
+def record_size(mode:Mode):
+    return START.size + (mode.height*mode.width + 7)//8
+
+def pack(mode:Mode, mines:list[tuple[int,int]], start:tuple[int,int]):
+    assert len(mines) == mode.mines
+    bits = 0
+    for r,c in mines: bits |= 1 << r*mode.width+c
+    return START.pack(*start) + bits.to_bytes(
+        record_size(mode)-START.size, 'little')
+
+def unpack(mode:Mode, record:bytes):
+    '''Return (mines, start) of a record'''
+    start = START.unpack_from(record)
+    bits = int.from_bytes(record[START.size:], 'little')
+
+    mines:list[tuple[int,int]] = []
+    while bits:
+        low = bits & -bits
+        mines.append(divmod(low.bit_length()-1, mode.width))
+        bits ^= low
+    return mines, start
+
+def _read_header(f):
+    magic, version, h, w, mines = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a board library: {f.name}')
+    return Mode(h, w, mines)
+
+class LibraryWriter:
+    '''Append records to a library, creating it if needed'''
+    def __init__(self, path:str, mode:Mode):
+        self._mode = mode
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as f:
+                if _read_header(f) != mode:
+                    raise ValueError(f'{path} holds another mode')
+            self._f = open(path, 'ab')
+        else:
+            self._f = open(path, 'wb')
+            self._f.write(HEADER.pack(MAGIC, VERSION,
+                mode.height, mode.width, mode.mines))
+
+    def append(self, mines:list[tuple[int,int]], start:tuple[int,int]):
+        self._f.write(pack(self._mode, mines, start))
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+class Library:
+    '''Random access to the records of a library'''
+    def __init__(self, path:str):
+        self._f = open(path, 'rb')
+        self._mode = _read_header(self._f)
+        self._size = record_size(self._mode)
+
+        n = (os.path.getsize(path) - HEADER.size)//self._size
+        self._len = n
+        # an empty library cannot be mapped
+        self._map = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) \
+            if n else None
+
+    def __len__(self):
+        return self._len
+
+    def record(self, index:int):
+        '''Raw record bytes'''
+        if not -self._len <= index < self._len:
+            raise IndexError(f'record index out of range {index}')
+        index %= self._len
+        offset = HEADER.size + index*self._size
+        return self._map[offset:offset+self._size]
+
+    def __getitem__(self, index:int):
+        '''Return (mines, start) of a record'''
+        return unpack(self._mode, self.record(index))
+
+    def game(self, index:int, **kwargs):
+        return Game.from_record(self._mode, self.record(index), **kwargs)
+
+    def close(self):
+        if self._map: self._map.close()
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    @property
+    def mode(self):
+        return self._mode
@@ -0,0 +1,189 @@
+from eqn import EQN, ALIGN
+from store import Handle
+from helper import IndexedSet
+import numpy as np
+import random
+
+# eqn.ALIGN as an array, for fancy indexing
+_ALIGN = np.array(ALIGN, dtype=np.int16)
+_ROW = 1 << 20 # anchor key (sr,sc) -> sr*_ROW + sc, sc is in -1.._ROW-3
+
+class NPStore:
+    '''Store keeping equations as parallel arrays (struct of arrays).
+    Overlaps are checked with array operations, over the equations a
+    spatial index of anchors says can overlap'''
+    def __init__(self, rng:random.Random|None=None, capacity:int=64):
+        self._rng = rng if rng is not None else random
+        self._sr = np.zeros(capacity, dtype=np.int32)
+        self._sc = np.zeros(capacity, dtype=np.int32)
+        self._mask = np.zeros(capacity, dtype=np.int16)
+        self._mines = np.zeros(capacity, dtype=np.int16)
+        self._gens = np.zeros(capacity, dtype=np.int64)
+        self._alive = np.zeros(capacity, dtype=np.bool_)
+
+        self._size = 0 # slots in use, dead or alive
+        self._free:list[int] = []
+        self._live = IndexedSet() # slots in use, for pick
+        self._lookup:dict[int, int] = {} # _key(eqn) -> slot
+        # spatial index: (sr,sc) anchor -> slots
+        self._cells:dict[tuple[int,int], list[int]] = {}
+        # todo queue, handles of removed slots are skipped on fetch
+        self._todo:list[Handle] = []
+        self._todo_head = 0
+
+    def _grow(self):
+        cap = len(self._alive)*2
+        for name in ('_sr', '_sc', '_mask', '_mines', '_gens', '_alive'):
+            old = getattr(self, name)
+            new = np.zeros(cap, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    @staticmethod
+    def _key(sr:int, sc:int, mask:int):
+        # anchors can be -1 (top/left border)
+        return (sr+1) << 24 | (sc+1) << 9 | mask
+
+    def _eqn_at(self, slot:int):
+        return EQN(int(self._sr[slot]), int(self._sc[slot]),
+            int(self._mask[slot]), int(self._mines[slot])
+        )
+
+    def __len__(self):
+        return len(self._lookup)
+
+    def get_overlap(self, eqn:EQN):
+        # only anchors within 2 rows/cols can share a square
+        sr, sc, cells = eqn.sr, eqn.sc, self._cells
+        slots = [slot for dr in range(-2, 3) for dc in range(-2, 3)
+            for slot in cells.get((sr+dr, sc+dc), ())]
+        if not slots: return []
+        slots = np.array(slots)
+        dr, dc = self._sr[slots]-sr, self._sc[slots]-sc
+        hit = _ALIGN[dr+2, dc+2, self._mask[slots]] & eqn.mask
+        slots = slots[hit != 0]
+        return list(zip(slots.tolist(), self._gens[slots].tolist()))
+
+    def get_conflicts(self):
+        '''Bitmask of overlapping equations for each one of get_all()'''
+        slots = np.flatnonzero(self._alive[:self._size])
+        n = len(slots)
+        sr, sc, mask = self._sr[slots], self._sc[slots], self._mask[slots]
+        # equations sorted by anchor, the ones at an anchor are a range
+        key = sr.astype(np.int64)*_ROW + sc
+        order = np.argsort(key, kind='stable')
+        keys = key[order]
+
+        ret = [0]*n
+        for dr in range(-2, 3):
+            for dc in range(-2, 3):
+                # pairs (i, j), j anchored at dr,dc from i
+                q = key + dr*_ROW + dc
+                lo = np.searchsorted(keys, q, 'left')
+                cnt = np.searchsorted(keys, q, 'right') - lo
+                total = int(cnt.sum())
+                if not total: continue
+                i = np.repeat(np.arange(n), cnt)
+                j = order[np.arange(total)
+                    + np.repeat(lo - np.cumsum(cnt) + cnt, cnt)]
+                hit = (_ALIGN[dr+2, dc+2, mask[j]] & mask[i] != 0) & (i != j)
+                for a, b in zip(i[hit].tolist(), j[hit].tolist()):
+                    ret[a] |= 1 << b
+        return ret
+
+    def add(self, eqn:EQN):
+        key = self._key(eqn.sr, eqn.sc, eqn.mask)
+        slot = self._lookup.get(key)
+        if slot is not None:
+            assert self._mines[slot] == eqn.mines
+            return
+
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self._size == len(self._alive): self._grow()
+            slot = self._size
+            self._size += 1
+
+        self._sr[slot], self._sc[slot] = eqn.sr, eqn.sc
+        self._mask[slot] = eqn.mask
+        self._mines[slot] = eqn.mines
+        self._alive[slot] = True
+
+        self._lookup[key] = slot
+        self._live.add(slot)
+        self._cells.setdefault((eqn.sr, eqn.sc), []).append(slot)
+        self._todo.append((slot, int(self._gens[slot])))
+
+    def valid(self, handle:Handle):
+        slot, gen = handle
+        return bool(self._alive[slot]) and self._gens[slot] == gen
+
+    def remove(self, handle:Handle):
+        assert self.valid(handle)
+        slot = handle[0]
+        sr, sc = int(self._sr[slot]), int(self._sc[slot])
+        del self._lookup[self._key(sr, sc, int(self._mask[slot]))]
+        self._live.discard(slot)
+        cell = self._cells[sr,sc]
+        cell.remove(slot)
+        if not cell: del self._cells[sr,sc]
+
+        self._alive[slot] = False
+        self._gens[slot] += 1 # outstanding handles go stale
+        self._free.append(slot)
+
+    def get_eqn(self, handle:Handle):
+        assert self.valid(handle)
+        return self._eqn_at(handle[0])
+
+    def get_all(self):
+        slots = np.flatnonzero(self._alive[:self._size])
+        return [EQN(*v) for v in zip(
+            self._sr[slots].tolist(), self._sc[slots].tolist(),
+            self._mask[slots].tolist(), self._mines[slots].tolist()
+        )]
+
+    def pick(self):
+        if not self._live: return None
+        return self._eqn_at(self._live.choice(self._rng))
+
+    def copy(self):
+        '''Independent store with the same equations and todo list'''
+        ret = NPStore(self._rng, len(self._alive))
+        for name in ('_sr', '_sc', '_mask', '_mines', '_gens', '_alive'):
+            setattr(ret, name, getattr(self, name).copy())
+        ret._size = self._size
+        ret._free = self._free.copy()
+        ret._live = self._live.copy()
+        ret._lookup = self._lookup.copy()
+        ret._cells = {k: cell.copy() for k, cell in self._cells.items()}
+        ret._todo = self._todo[self._todo_head:]
+        return ret
+
+    def fetch(self):
+        while self._todo_head < len(self._todo):
+            handle = self._todo[self._todo_head]
+            self._todo_head += 1
+            if self.valid(handle): break
+        else:
+            self._todo.clear()
+            self._todo_head = 0
+            return None
+
+        # drop the consumed part once it dominates the queue
+        if self._todo_head*2 > len(self._todo):
+            del self._todo[:self._todo_head]
+            self._todo_head = 0
+        return self._eqn_at(handle[0])
+
+    def clear(self):
+        self._alive[:] = False
+        self._gens[:self._size] += 1
+        self._size = 0
+        self._free.clear()
+        self._live = IndexedSet()
+        self._lookup.clear()
+        self._cells.clear()
+        self._todo.clear()
+        self._todo_head = 0
@@ -0,0 +1,172 @@
+'''Ready-made boards per mode, so the first click does not wait for
+the generator'''
+from game import Game, Mode, Item
+from solver import Cancelled
+
+import random
+from collections import deque
+from queue import Empty, Queue
+from threading import Condition, Event, Thread
+
+Coord = tuple[int,int]
+
+def _symmetries(h:int, w:int):
+    '''Maps of the board onto itself'''
+    ret = [
+        lambda r,c: (r, c),
+        lambda r,c: (h-1-r, c),
+        lambda r,c: (r, w-1-c),
+        lambda r,c: (h-1-r, w-1-c),
+    ]
+    if h == w: ret += [
+        lambda r,c: (c, r),
+        lambda r,c: (w-1-c, h-1-r),
+        lambda r,c: (c, h-1-r),
+        lambda r,c: (w-1-c, r),
+    ]
+    return ret
+
+class _Board:
+    def __init__(self, mines:list[Coord], region:set[Coord]):
+        self.mines = mines
+        # ZERO squares opened by the first click, clicking any of them
+        # reveals the same area, so the board is solvable from each
+        self.region = region
+
+class BoardPool:
+    '''Boards of a mode generated by a background thread.
+    A board is served for a click anywhere in its first opened ZERO
+    area, or in a mirrored/rotated copy of it'''
+    def __init__(self, mode:Mode, size:int=5):
+        self._mode = mode
+        self._size = size
+        self._boards:deque[_Board] = deque()
+        self._symmetries = _symmetries(mode.height, mode.width)
+        self._rng = random.Random() # only used by the worker
+
+        self._cond = Condition()
+        self._stop:Event|None = None # of the running worker
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._generated = 0
+
+    def start(self):
+        if self._stop and not self._stop.is_set(): return
+        self._stop = Event()
+        Thread(target=self._work, args=(self._stop,), daemon=True).start()
+
+    def stop(self):
+        '''Stop filling, the board being generated is still added'''
+        if not self._stop: return
+        with self._cond:
+            self._stop.set()
+            self._cond.notify_all()
+
+    def _work(self, stop:Event):
+        while True:
+            with self._cond:
+                while not stop.is_set() \
+                and len(self._boards) >= self._size:
+                    self._cond.wait()
+                if stop.is_set(): return
+
+            board = self._generate()
+            with self._cond:
+                self._boards.append(board)
+                self._generated += 1
+
+    def _generate(self):
+        mode = self._mode
+        rng = self._rng
+        game = Game(mode, rng=rng)
+        start = rng.randrange(mode.height), rng.randrange(mode.width)
+        revealed = game.flood(*start)
+        region = {pos for pos in revealed
+            if game.item_at(*pos) is Item.ZERO
+        }
+        return _Board(game.mine_coords, region)
+
+    def take(self, row:int, col:int):
+        '''Return (mines, start) of a board solvable from row,col,
+        or None if there is no such board'''
+        with self._cond:
+            for board in self._boards:
+                for f in self._symmetries:
+                    if not any(f(*pos) == (row,col) for pos in board.region):
+                        continue
+
+                    self._boards.remove(board)
+                    self._hits += 1
+                    self._cond.notify_all()
+                    return [f(*pos) for pos in board.mines], (row,col)
+
+            self._misses += 1
+            # a full pool missed, make room for a fresh board
+            if len(self._boards) >= self._size:
+                self._boards.popleft()
+                self._evictions += 1
+                self._cond.notify_all()
+        return None
+
+    def resize(self, size:int):
+        with self._cond:
+            self._size = size
+            while len(self._boards) > size:
+                self._boards.popleft()
+                self._evictions += 1
+            self._cond.notify_all()
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def stats(self):
+        with self._cond:
+            return {
+                'ready': len(self._boards),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'generated': self._generated,
+            }
+
+class Generation:
+    '''A board for a first click at row,col, generated by a worker
+    thread on a game of its own'''
+    def __init__(self, mode:Mode, row:int, col:int, stats:bool=False):
+        self._game = Game(mode, stats=stats)
+        self._cancel = Event()
+        self._done:Queue = Queue(maxsize=1)
+        Thread(target=self._work, args=(row,col), daemon=True).start()
+
+    def _work(self, row:int, col:int):
+        try: self._game.generate(row, col, self._cancel)
+        except Cancelled: return
+        except Exception as e: # handed to the polling thread
+            self._done.put(e)
+            return
+        self._done.put((self._game.mine_coords, (row,col),
+            self._game.gen_stats))
+
+    def poll(self):
+        '''Return (mines, start, stats) once ready, else None.
+        Raises what the generator raised'''
+        try: ret = self._done.get_nowait()
+        except Empty: return None
+        if isinstance(ret, Exception): raise ret
+        return ret
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def safes_left(self):
+        '''Safes the solver has not reached yet'''
+        return self._game.safes_left
\ No newline at end of file
@@ -1,120 +1,171 @@
-from game import Game, GameState, Item
+from game import Game, GameState, Item, shift_eqns
 from eqn import EQN
 from store import Store
+from stats import SolverStats
+from frontier import deduce
 from helper import vicinity, bitcnt16
-from time import sleep
+from collections import Counter
+
+class Cancelled(Exception):
+    '''Raised by solve() once its cancel event is set'''
 
 class Solver:
-    def __init__(self, game:Game, *, sleep_time=0.):
+    def __init__(self, game:Game, *, store:Store=None,
+            stats:SolverStats|None=None, exact:bool=False,
+            trace:list|None=None, cancel:'Event|None'=None):
         self._game = game
-        self._store = Store()
-        self._sleep_time = sleep_time
+        # any store with the Store interface, e.g. npstore.NPStore
+        self._store = store if store is not None else Store(game.rng)
+        # ('open'|'flag', row, col) of each move is appended to trace,
+        # a traced solve must not modify the map
+        self._trace = trace
+        self._cancel = cancel # threading.Event, checked between steps
+        # try the exact frontier solver before digging, off by default:
+        # in generation it has not been seen to spare a dig
+        self._exact = exact
+        # how often solve() restarted and the map was modified/digged
+        self._counts:Counter[str] = Counter()
+        self._modify = game.modify
+        self._dig = game.dig
+
+        self._stats = stats
+        if stats is not None: self._instrument(stats)
+
+    def _instrument(self, stats:SolverStats):
+        # wrap on the instance, an uninstrumented solver runs as is
+        self._counts = stats.events
+        self._store = stats.wrap_store(self._store)
+        for phase, name in (
+            ('solve', 'solve'), ('restart', '_rollback'),
+            ('lcl', '_lcl_deduct'), ('subtract', '_try_subtract'),
+            ('glb', '_glb_deduct'), ('exact', '_frt_deduct'),
+            ('modify', '_modify'), ('dig', '_dig'),
+        ):
+            setattr(self, name, stats.timed(phase, getattr(self, name)))
 
     def solve(self):
         if not self._game.start_coord: return
         self._store.clear()
         self._game.restart(False)
-        self._open(*self._game.start_coord)
 
-        self._clear = True
+        # squares opened/flagged in order, and index of the first
+        # action on each square
+        self._log:list[tuple[int,int]] = []
+        self._first:dict[tuple[int,int], int] = {}
+        # (log length, store copy) taken when deduction stalls
+        self._checkpoints = [(0, self._store.copy())]
+
+        self._open(*self._game.start_coord)
         self._iter()
-        if not self._clear: self.solve()
 
     def _iter(self):
         while True:
             if self.done: break
+            if self._cancel is not None and self._cancel.is_set():
+                raise Cancelled
             if self._lcl_deduct(): continue
             if self._glb_deduct(): continue
 
-            if self._sleep_time > 0:
-                raise RuntimeError('Modify the map when visualize')
+            if self._trace is not None:
+                if self._exact and self._frt_deduct(): continue
+                raise RuntimeError('Modify the map when tracing')
 
-            if self._game.modify(self._store): continue
-
-            r,c = self._game.dig()
-            assert self._game.unflag(r,c)
-            self._open(r,c)
+            self._checkpoint()
+            self._counts['modify'] += 1
+            if self._modify(self._store):
+                # squares moved were unknown at every checkpoint too
+                for _, store in self._checkpoints:
+                    shift_eqns(store, self._game.last_changes)
+                continue
 
-            # digging got potential to make the map unsolvable
-            # since it modify a known square --> not clear
-            self._clear = False
-            break
+            # a dig costs a rollback, worth one more try
+            if self._exact and self._frt_deduct(): continue
+            self._counts['dig'] += 1
+            self._dig()
+            # digging changes known squares, the map may be unsolvable
+            # from where they were learnt --> roll back past them
+            self._counts['restart'] += 1
+            self._rollback(self._game.last_changes)
+
+    def _checkpoint(self):
+        if self._checkpoints[-1][0] < len(self._log):
+            self._checkpoints.append((len(self._log), self._store.copy()))
+
+    def _rollback(self, changes:list[tuple[int,int,bool]]):
+        '''Return to the latest checkpoint whose known squares were not
+        affected by changes'''
+        affected = {(i,j) for r,c,_ in changes for i,j in vicinity(r,c)}
+        first = self._first
+        valid = min((first[pos] for pos in affected if pos in first),
+            default=len(self._log))
+
+        checkpoints = self._checkpoints
+        while checkpoints[-1][0] > valid: checkpoints.pop()
+        length, store = checkpoints[-1]
+
+        undone = self._log[length:]
+        del self._log[length:]
+        for pos in undone:
+            if first.get(pos, -1) >= length: del first[pos]
+        self._game.unplay(undone)
+        self._store = store.copy()
+        if length == 0: self._open(*self._game.start_coord)
 
     def _glb_deduct(self):
         '''Global deduction based on mines left'''
         mines_left = self._game.mines_left
         # OPEN THE REST
         if mines_left == 0:
-            for r,c in self._game.field_coords:
-                if self._game.item_at(r,c) is Item.UNOPEN:
-                    self._game.open(r,c, False)
+            for r,c in self._game.unopen_coords:
+                self._game.open(r,c, False)
+                if self._trace is not None: self._trace.append(('open', r,c))
             return True
 
-        DEPTH = 13
         eqns = self._store.get_all()
-        if len(eqns) > DEPTH: return False
-        squares_left = self._game.safes_left + mines_left
+        conflicts = self._store.get_conflicts()
+        safes_left = self._game.safes_left
+        squares_left = safes_left + mines_left
+
+        # UNION DEDUCTION
+        # a disjoint union of equations holding all mines left leaves
+        # only safes outside of it, one holding all safes left only mines
+        for target, value, f in (
+            (mines_left, _mines, self._open),
+            (safes_left, _safes, self._flag),
+        ):
+            used = _disjoint_union(eqns, conflicts, value, target)
+            if used is None: continue
+            inside = {pos for i,e in enumerate(eqns) if used >> i & 1
+                for pos in e.vars_pos
+            }
+            if len(inside) == squares_left: continue
+
+            for r,c in self._game.unopen_coords:
+                if (r,c) not in inside \
+                and self._game.item_at(r,c) is Item.UNOPEN: f(r,c)
+            return True
 
-        # DISJOINT DEDUCTION
-        # backtrack to find an disjoint union of equations
-        # which leave the mines left = 0 or = remaining squares
-        used = [False for _ in range(len(eqns))]
-        cursor = 0 # backtrack pointer
-        while True:
-            if cursor < len(eqns):
-                e0 = eqns[cursor]
-                ok = True
-                # not ok if overlap with an used equation
-                for i in range(cursor):
-                    if used[i] and e0.munge(eqns[i], False):
-                        ok = False
-                        break
-                if ok:
-                    # add to disjoint union
-                    mines_left -= e0.mines
-                    squares_left -= bitcnt16(e0.mask)
-
-                used[cursor] = ok
-                cursor += 1
-                continue
+        return False
 
-            # reach the end -> found a disjoint union
-            if squares_left > 0 and \
-            (mines_left == 0 or mines_left == squares_left):
-                # print('-> Union: ')
-                # for i,e in enumerate(eqns):
-                #     if used[i]: print(e)
-
-                # can open/flag all squares outside the union
-                f = self._open if mines_left == 0 else self._flag
-                for r,c in self._game.field_coords:
-                    if self._game.item_at(r,c) is Item.UNOPEN:
-                        outside = True
-                        e = EQN(r,c,1,0)
-                        for i in range(len(eqns)):
-                            if used[i] and eqns[i].munge(e, False):
-                                outside = False
-                                break
-                        if outside: f(r,c)
-                return True
-
-            cursor -= 1 # why?
-            # find the nearest used eqn
-            while cursor >= 0 and used[cursor] == 0: cursor-=1
-            if cursor < 0: break
-
-            # BACKTRACK
-            used[cursor] = 0 # unuse the eqn
-
-            # reset mines_left and squares_left
-            e0 = eqns[cursor]
-            mines_left += e0.mines
-            squares_left += bitcnt16(e0.mask)
-
-            cursor += 1
-            continue
+    def _frt_deduct(self):
+        '''Exact deduction over all equations, see frontier.py'''
+        mines_left = self._game.mines_left
+        squares_left = self._game.safes_left + mines_left
+        d = deduce(self._store.get_all(), mines_left, squares_left)
+        if not d: return False
 
-        return False
+        for r,c in d.mines: self._flag(r,c)
+        for r,c in d.safes:
+            if self.done: return True
+            self._open(r,c)
+
+        if d.interior_safe or d.interior_mine:
+            f = self._open if d.interior_safe else self._flag
+            for r,c in self._game.unopen_coords:
+                if self.done: break
+                if (r,c) not in d.frontier \
+                and self._game.item_at(r,c) is Item.UNOPEN: f(r,c)
+        return True
 
     def _lcl_deduct(self):
         '''Process equations from todo list'''
@@ -183,12 +234,16 @@ class Solver:
 
     def _open(self, row:int, col:int):
         assert self._game.open(row,col, False)
-        sleep(self._sleep_time)
-        self._process_new(row,col)
+        self._played('open', row,col)
 
     def _flag(self, row:int, col:int):
         assert self._game.flag(row,col)
-        sleep(self._sleep_time)
+        self._played('flag', row,col)
+
+    def _played(self, action:str, row:int, col:int):
+        self._first.setdefault((row,col), len(self._log))
+        self._log.append((row,col))
+        if self._trace is not None: self._trace.append((action, row,col))
         self._process_new(row,col)
 
     def _process_new(self, row:int, col:int):
@@ -210,8 +265,6 @@ class Solver:
             new_eqn = EQN(e1.sr, e1.sc, new_mask, new_mines)
             self._store.add(new_eqn)
 
-        self._store.clean()
-
     def _add_around(self, r:int, c:int):
         value = self._game.item_at(r,c).value
         if value < 0: return
@@ -229,6 +282,83 @@ class Solver:
         new_eqn = EQN(r-1,c-1, mask, mines)
         self._store.add(new_eqn)
 
+    @property
+    def counts(self):
+        return self._counts
+
+    @property
+    def stats(self):
+        return self._stats
+
     @property
     def done(self):
-        return self._game.state is not GameState.PLAY
\ No newline at end of file
+        return self._game.state is not GameState.PLAY
+
+def _mines(e:EQN):
+    return e.mines
+
+def _safes(e:EQN):
+    return bitcnt16(e.mask) - e.mines
+
+def _components(conflicts:list[int]):
+    '''Indices of equations grouped by connected component of the
+    overlap graph, each in BFS order'''
+    seen = 0
+    for i in range(len(conflicts)):
+        if seen >> i & 1: continue
+        seen |= 1 << i
+        order = [i]
+        for j in order: # grows while iterating
+            new = conflicts[j] & ~seen
+            seen |= new
+            while new:
+                low = new & -new
+                order.append(low.bit_length()-1)
+                new ^= low
+        yield order
+
+def _merge(tables:dict, key:int, table:dict, dv:int, dn:int, bit:int,
+        target:int):
+    '''Add table shifted by dv/dn into tables[key], keeping the union
+    with fewest squares for each value'''
+    dst = tables.get(key)
+    if dst is None: dst = tables[key] = {}
+    for v, (n, used) in table.items():
+        v += dv
+        if v > target: continue
+        old = dst.get(v)
+        if old is None or old[0] > n+dn: dst[v] = n+dn, used|bit
+
+def _disjoint_union(eqns:list[EQN], conflicts:list[int], value, target:int):
+    '''Bitmask of pairwise disjoint equations whose values add up to
+    target, covering as few squares as possible, or None'''
+    total = {0: (0, 0)} # value -> (squares, used) over done components
+    for order in _components(conflicts):
+        # frontier DP over the component, a state is the set of
+        # unprocessed equations blocked by the chosen ones
+        remaining = 0
+        for i in order: remaining |= 1 << i
+        states = {0: {0: (0, 0)}}
+        for i in order:
+            bit = 1 << i
+            remaining ^= bit
+            e = eqns[i]
+            v, n = value(e), bitcnt16(e.mask)
+            new = {}
+            for blocked, table in states.items():
+                _merge(new, blocked & remaining, table, 0, 0, 0, target)
+                if not blocked & bit: _merge(new,
+                    (blocked|conflicts[i]) & remaining, table, v, n, bit,
+                    target)
+            states = new
+
+        comp = {}
+        for table in states.values(): _merge(comp, 0, table, 0,0,0, target)
+        # knapsack over components
+        new = {}
+        for v, (n, used) in total.items():
+            _merge(new, 0, comp[0], v, n, used, target)
+        total = new[0]
+
+    found = total.get(target)
+    return found[1] if found else None
\ No newline at end of file
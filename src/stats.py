@@ -0,0 +1,104 @@
+'''Opt-in instrumentation of a Solver run'''
+from collections import Counter
+from time import perf_counter
+
+PHASES = ('solve', 'lcl', 'subtract', 'glb', 'exact', 'modify', 'dig',
+    'restart')
+
+class SolverStats:
+    '''Calls and wall time per phase, equation traffic of the store and
+    modify/dig/restart events. Times are inclusive (lcl contains
+    subtract, solve contains everything). Only an instrumented solver
+    pays for it, see Solver(stats=...)'''
+    def __init__(self):
+        self.calls:Counter[str] = Counter()
+        self.times:Counter[str] = Counter()
+        self.events:Counter[str] = Counter()
+        self.added = 0 # equations, duplicates excluded
+        self.removed = 0
+        self.peak = 0 # most equations in the store at once
+        self._active:set[str] = set()
+
+    def timed(self, phase:str, fn):
+        '''Wrap fn to count and time its calls as phase, recursive
+        calls are counted but only timed once'''
+        active = self._active
+        def wrapper(*args, **kwargs):
+            self.calls[phase] += 1
+            if phase in active: return fn(*args, **kwargs)
+            active.add(phase)
+            t = perf_counter()
+            try: return fn(*args, **kwargs)
+            finally:
+                self.times[phase] += perf_counter() - t
+                active.discard(phase)
+        return wrapper
+
+    def wrap_store(self, store):
+        return _CountingStore(store, self)
+
+    def merge(self, other:'SolverStats'):
+        '''Add up stats of another run, peak is the max of both'''
+        self.calls.update(other.calls)
+        self.times.update(other.times)
+        self.events.update(other.events)
+        self.added += other.added
+        self.removed += other.removed
+        self.peak = max(self.peak, other.peak)
+
+    def as_dict(self):
+        return {
+            'calls': {k: self.calls[k] for k in PHASES},
+            'times': {k: self.times[k] for k in PHASES},
+            'events': {k: self.events[k] for k in ('modify','dig','restart')},
+            'added': self.added,
+            'removed': self.removed,
+            'peak': self.peak,
+        }
+
+    @classmethod
+    def from_dict(cls, d:dict):
+        ret = cls()
+        ret.calls.update(d['calls'])
+        ret.times.update(d['times'])
+        ret.events.update(d['events'])
+        ret.added, ret.removed, ret.peak = d['added'], d['removed'], d['peak']
+        return ret
+
+    def __str__(self):
+        lines = [f'{"phase":10}{"calls":>8}{"time":>10}']
+        for k in PHASES:
+            lines.append(f'{k:10}{self.calls[k]:>8}'
+                f'{self.times[k]*1000:>8.1f}ms')
+        lines.append('events ' + ', '.join(
+            f'{k}={self.events[k]}' for k in ('modify','dig','restart')))
+        lines.append(f'equations added={self.added} '
+            f'removed={self.removed} peak={self.peak}')
+        return '\n'.join(lines)
+
+class _CountingStore:
+    '''Store proxy counting added/removed equations'''
+    def __init__(self, store, stats:SolverStats):
+        self._store = store
+        self._stats = stats
+
+    def add(self, eqn):
+        store, stats = self._store, self._stats
+        n = len(store)
+        store.add(eqn)
+        if len(store) > n:
+            stats.added += 1
+            if n >= stats.peak: stats.peak = n+1
+
+    def remove(self, handle):
+        self._store.remove(handle)
+        self._stats.removed += 1
+
+    def __len__(self):
+        return len(self._store)
+
+    def copy(self):
+        return _CountingStore(self._store.copy(), self._stats)
+
+    def __getattr__(self, name:str):
+        return getattr(self._store, name)
\ No newline at end of file
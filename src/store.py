@@ -1,4 +1,5 @@
 from eqn import EQN
+from helper import IndexedSet
 import random
 
 class _Node:
@@ -29,26 +30,84 @@ class _Node:
     def eqn(self):
         return self._eqn
 
+# stable reference to a stored equation: (slot, generation)
+# a slot is reused after removal, but with a bumped generation
+Handle = tuple[int,int]
+
 class Store:
-    def __init__(self):
+    def __init__(self, rng:random.Random|None=None):
+        self._rng = rng if rng is not None else random
         self._nodes:list[_Node|None] = []
+        self._gens:list[int] = [] # generation of each slot
+        self._free:list[int] = [] # slots of removed nodes
+        self._live = IndexedSet() # slots in use, for pick
+        self._lookup:dict[EQN, int] = {} # eqn -> slot
+        # spatial index: (sr,sc) anchor -> slots of equations
+        self._cells:dict[tuple[int,int], set[int]] = {}
         # doubly linked todo list
         self._head:_Node = None
         self._tail:_Node = None
 
+    def __len__(self):
+        return len(self._lookup)
+
     def get_overlap(self, eqn:EQN):
-        return [i for i, node in enumerate(self._nodes)
-            if node and eqn.munge(node.eqn, False)
-        ]
+        # only anchors within 2 rows/cols can share a square
+        ret:list[Handle] = []
+        for dr in range(-2, 3):
+            for dc in range(-2, 3):
+                cell = self._cells.get((eqn.sr+dr, eqn.sc+dc))
+                if not cell: continue
+                ret.extend((i, self._gens[i]) for i in cell
+                    if eqn.munge(self._nodes[i].eqn, False)
+                )
+        return ret
+
+    def get_conflicts(self):
+        '''Bitmask of overlapping equations for each one of get_all()'''
+        pos = {} # slot -> position in get_all()
+        for i, node in enumerate(self._nodes):
+            if node: pos[i] = len(pos)
+
+        ret:list[int] = []
+        for i in pos:
+            bits = 0
+            for j,_ in self.get_overlap(self._nodes[i].eqn):
+                if j != i: bits |= 1 << pos[j]
+            ret.append(bits)
+        return ret
 
     def add(self, eqn:EQN):
-        for node in self._nodes:
-            if node and node.eqn == eqn: return
+        # lookup compares by __eq__, which checks mines
+        if eqn in self._lookup: return
 
         new_node = _Node(eqn)
-        self._nodes.append(new_node)
+        if self._free:
+            slot = self._free.pop()
+            self._nodes[slot] = new_node
+        else:
+            slot = len(self._nodes)
+            self._nodes.append(new_node)
+            self._gens.append(0)
+
+        self._lookup[eqn] = slot
+        self._live.add(slot)
+        self._index(eqn, slot)
         self._add_todo(new_node)
 
+    def _index(self, eqn:EQN, slot:int):
+        key = eqn.sr, eqn.sc
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = set()
+        cell.add(slot)
+
+    def _unindex(self, eqn:EQN, slot:int):
+        key = eqn.sr, eqn.sc
+        cell = self._cells[key]
+        cell.discard(slot)
+        if not cell: del self._cells[key]
+
     def _add_todo(self, node:_Node):
         node.prev = self._tail
         if node.prev:
@@ -56,10 +115,23 @@ class Store:
         else: self._head = node
         self._tail = node
 
-    def remove(self, index:int):
-        assert index > -1
-        self._remove_todo(self._nodes[index])
-        self._nodes[index] = None
+    def valid(self, handle:Handle):
+        slot, gen = handle
+        return self._gens[slot] == gen \
+        and self._nodes[slot] is not None
+
+    def remove(self, handle:Handle):
+        assert self.valid(handle)
+        slot = handle[0]
+        node = self._nodes[slot]
+        self._remove_todo(node)
+        self._unindex(node.eqn, slot)
+        del self._lookup[node.eqn]
+        self._live.discard(slot)
+
+        self._nodes[slot] = None
+        self._gens[slot] += 1 # outstanding handles go stale
+        self._free.append(slot)
 
     def _remove_todo(self, node:_Node):
         if node.prev:
@@ -75,19 +147,32 @@ class Store:
         node.prev = None
         node.next = None
 
-    def clean(self):
-        self._nodes = [node for node in self._nodes if node]
-
-    def get_eqn(self, index:int):
-        assert index > -1
-        return self._nodes[index].eqn
+    def get_eqn(self, handle:Handle):
+        assert self.valid(handle)
+        return self._nodes[handle[0]].eqn
 
     def get_all(self):
-        return [node.eqn for node in self._nodes]
+        return [node.eqn for node in self._nodes if node]
 
     def pick(self):
-        if not self._nodes: return None
-        return random.choice(self._nodes).eqn
+        if not self._live: return None
+        return self._nodes[self._live.choice(self._rng)].eqn
+
+    def copy(self):
+        '''Independent store with the same equations and todo list'''
+        ret = Store(self._rng)
+        ret._nodes = [node and _Node(node.eqn) for node in self._nodes]
+        ret._gens = self._gens.copy()
+        ret._free = self._free.copy()
+        ret._live = self._live.copy()
+        ret._lookup = self._lookup.copy()
+        ret._cells = {k: cell.copy() for k, cell in self._cells.items()}
+
+        node = self._head
+        while node:
+            ret._add_todo(ret._nodes[self._lookup[node.eqn]])
+            node = node.next
+        return ret
 
     def fetch(self):
         ret = self._head
@@ -97,5 +182,10 @@ class Store:
 
     def clear(self):
         self._nodes.clear()
+        self._gens.clear()
+        self._free.clear()
+        self._live = IndexedSet()
+        self._cells.clear()
+        self._lookup.clear()
         self._head = None
         self._tail = None
\ No newline at end of file
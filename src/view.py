@@ -1,5 +1,6 @@
 from helper import get_img, vicinity, sec2min, repr_today
 from game import Item, GameState, Game
+from pool import BoardPool, Generation
 
 from time import time
 
@@ -12,57 +13,65 @@ class _GridView(Canvas):
     BD = 5
 
     IMG_SIZE = CELL_SIZE, CELL_SIZE
-    IMGS = {
-        Item.ZERO: get_img('0.png', IMG_SIZE),
-        Item.ONE: get_img('1.png', IMG_SIZE),
-        Item.TWO: get_img('2.png', IMG_SIZE),
-        Item.THREE: get_img('3.png', IMG_SIZE),
-        Item.FOUR: get_img('4.png', IMG_SIZE),
-        Item.FIVE: get_img('5.png', IMG_SIZE),
-        Item.SIX: get_img('6.png', IMG_SIZE),
-        Item.SEVEN: get_img('7.png', IMG_SIZE),
-        Item.EIGHT: get_img('8.png', IMG_SIZE),
-
-        Item.FLAG: get_img('flag.png', IMG_SIZE),
-        Item.UNOPEN: get_img('unopen.png', IMG_SIZE),
-        Item.BOMB: get_img('bomb.png', IMG_SIZE),
-        Item.BADFLAG: get_img('badflag.png', IMG_SIZE)
+    IMG_FILES = {
+        Item.ZERO: '0.png',
+        Item.ONE: '1.png',
+        Item.TWO: '2.png',
+        Item.THREE: '3.png',
+        Item.FOUR: '4.png',
+        Item.FIVE: '5.png',
+        Item.SIX: '6.png',
+        Item.SEVEN: '7.png',
+        Item.EIGHT: '8.png',
+
+        Item.FLAG: 'flag.png',
+        Item.UNOPEN: 'unopen.png',
+        Item.BOMB: 'bomb.png',
+        Item.BADFLAG: 'badflag.png'
     }
+    # PhotoImages of the Tk root they were made for, shared by all grids
+    _shared:tuple[Tk, dict[Item, ImageTk.PhotoImage]]|None = None
 
-    def __init__(self, master, height:int, width:int):
+    # largest viewport in pixels, bigger boards scroll
+    MAX_VIEW = 1200, 700
+    MARGIN = 2 # cells kept around the viewport
+
+    def __init__(self, master, game:Game):
         super().__init__(master)
+        self._game = game # cells are painted from game.item_at
 
-        self.__h, self.__w = height, width
+        self.__h, self.__w = game.mode.height, game.mode.width
         # in pixels
         self._scrh = self.__h*self.CELL_SIZE + self.BD*2
         self._scrw = self.__w*self.CELL_SIZE + self.BD*2
+        self._viewh = min(self._scrh, self.MAX_VIEW[1])
+        self._vieww = min(self._scrw, self.MAX_VIEW[0])
 
         self.config(highlightthickness=0,
-            height=self._scrh,
-            width= self._scrw
+            height=self._viewh,
+            width=self._vieww,
+            scrollregion=(0, 0, self._scrw, self._scrh),
+            xscrollincrement=self.CELL_SIZE,
+            yscrollincrement=self.CELL_SIZE,
         )
         self._load_imgs()
         self._build()
 
     def _load_imgs(self):
-        self._tkimgs = {
-            item: ImageTk.PhotoImage(self.IMGS[item])
-            for item in self.IMGS
-        }
+        # scaled and converted on the first grid, not at import
+        root = self._root()
+        if not _GridView._shared or _GridView._shared[0] is not root:
+            _GridView._shared = root, {
+                item: ImageTk.PhotoImage(get_img(file, self.IMG_SIZE))
+                for item, file in self.IMG_FILES.items()
+            }
+        self._tkimgs = _GridView._shared[1]
 
     def _build(self):
-        self._img_ids = [
-            [None for _ in range(self.__w)]
-            for _ in range(self.__h)
-        ] # use to change image later on
-
-        for r in range(self.__h):
-            for c in range(self.__w):
-                self._img_ids[r][c] = self.create_image(
-                    c*self.CELL_SIZE + self.BD,
-                    r*self.CELL_SIZE + self.BD,
-                    image=self._tkimgs[Item.UNOPEN], anchor=NW
-                )
+        # image items of the cells in view, recycled on scroll
+        self._img_ids:dict[tuple[int,int], int] = {}
+        self._range = 0, 0, 0, 0 # rows r0:r1, cols c0:c1 with items
+        self._refresh()
 
         # sunken effect
         for p in range(self.BD):
@@ -71,16 +80,77 @@ class _GridView(Canvas):
             self.create_line(p,0, p,self._scrh-p,
                 fill='#999999')
 
+        if self.scrollable:
+            self.bind('<MouseWheel>', lambda e: self._wheel(
+                'x' if e.state & 1 else 'y', self._wheel_units(e.delta)))
+            self.bind('<4>', lambda e: self._wheel('y', -1))
+            self.bind('<5>', lambda e: self._wheel('y', 1))
+            self.bind('<Shift-4>', lambda e: self._wheel('x', -1))
+            self.bind('<Shift-5>', lambda e: self._wheel('x', 1))
+
+    @staticmethod
+    def _wheel_units(delta:int):
+        '''Units to scroll for a wheel delta, 120 per notch on Windows
+        but as small as 1 on macOS'''
+        if not delta: return 0
+        return int(-delta/120) or (-1 if delta > 0 else 1)
+
+    def _wheel(self, axis:str, units:int):
+        view = self.xview if axis == 'x' else self.yview
+        view('scroll', units, 'units')
+
+    def xview(self, *args):
+        ret = super().xview(*args)
+        if args: self._refresh()
+        return ret
+
+    def yview(self, *args):
+        ret = super().yview(*args)
+        if args: self._refresh()
+        return ret
+
+    def _refresh(self):
+        '''Give an item to every cell in view (plus a margin), moving
+        items of cells that scrolled out'''
+        cs, bd, m = self.CELL_SIZE, self.BD, self.MARGIN
+        x0, y0 = self.canvasx(0), self.canvasy(0)
+        r0 = max(0, int(y0-bd)//cs - m)
+        c0 = max(0, int(x0-bd)//cs - m)
+        r1 = min(self.__h, int(y0-bd+self._viewh)//cs + 1 + m)
+        c1 = min(self.__w, int(x0-bd+self._vieww)//cs + 1 + m)
+        if (r0, r1, c0, c1) == self._range: return
+        self._range = r0, r1, c0, c1
+
+        ids = self._img_ids
+        free = [ids.pop(pos) for pos in list(ids)
+            if not (r0 <= pos[0] < r1 and c0 <= pos[1] < c1)
+        ]
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                if (r,c) in ids: continue
+                x, y = c*cs + bd, r*cs + bd
+                image = self._tkimgs[self._game.item_at(r,c)]
+                if free:
+                    ids[r,c] = free.pop()
+                    self.coords(ids[r,c], x, y)
+                    self.itemconfig(ids[r,c], image=image)
+                else: ids[r,c] = self.create_image(x, y,
+                    image=image, anchor=NW)
+        for i in free: self.delete(i)
+
     def handle_click(self, event:Event):
-        r = (event.y-self.BD)//self.CELL_SIZE
-        c = (event.x-self.BD)//self.CELL_SIZE
+        r = int(self.canvasy(event.y)-self.BD)//self.CELL_SIZE
+        c = int(self.canvasx(event.x)-self.BD)//self.CELL_SIZE
         return r,c
 
     def adjust(self, row:int, col:int, item:Item):
-        self.itemconfig(
-            self._img_ids[row][col],
-            image=self._tkimgs[item]
-        )
+        # cells out of view are read from the game when scrolled in
+        i = self._img_ids.get((row,col))
+        if i is not None: self.itemconfig(i, image=self._tkimgs[item])
+
+    @property
+    def scrollable(self):
+        return (self._viewh, self._vieww) != (self._scrh, self._scrw)
 
 class _SttBar(Label):
     def __init__(self, master):
@@ -92,6 +162,9 @@ class _SttBar(Label):
             anchor=W, width=23
         )
 
+    def generating(self, safes_left:int):
+        self._stt.set(f'Generating... ({safes_left} left)')
+
     def adjust(self, mines_left:int, safes_left:int, state:GameState):
         if state is GameState.WIN:
             stt = 'COMPLETE !'
@@ -145,15 +218,67 @@ class Timer(Label):
         return self._time if self._stime < 0 \
         else self._time + time() - self._stime
 
+class _Replay:
+    '''Play a solver trace on the game of a view, one move per after()
+    tick so the event loop keeps running'''
+    DELAYS = (1000, 500, 200, 100, 50, 20, 5) # ms between moves
+
+    def __init__(self, view:'GameView', trace:list[tuple[str,int,int]]):
+        self._view = view
+        self._trace = trace
+        self._next = 0 # index of the next move
+        self._speed = 3
+        self._job = None # pending after() id, None when paused/done
+
+    def start(self):
+        if not self.done: self._schedule()
+
+    def _schedule(self):
+        self._job = self._view.after(self.DELAYS[self._speed], self._step)
+
+    def _step(self):
+        self._job = None
+        action, r, c = self._trace[self._next]
+        self._next += 1
+        self._view.play(action, r, c)
+        if not self.done: self._schedule()
+
+    def toggle_pause(self):
+        if self._job: self.cancel()
+        else: self.start()
+
+    def change_speed(self, d:int):
+        self._speed = max(0, min(len(self.DELAYS)-1, self._speed+d))
+
+    def cancel(self):
+        if self._job: self._view.after_cancel(self._job)
+        self._job = None
+
+    @property
+    def done(self):
+        return self._next >= len(self._trace) \
+        or self._view.game.state is not GameState.PLAY
+
 class GameView(Frame):
-    def __init__(self, master, game:Game, records:list):
+    def __init__(self, master, game:Game, records:list,
+            pool:BoardPool|None=None):
         super().__init__(master)
         self._game = game
+        self._pool = pool # serves the first click if it can
         mode = self._game.mode
 
         gridframe = Frame(self, bg='#d2d2d2') # for sunken effect
         gridframe.pack()
-        self._grid = _GridView(gridframe, mode.height, mode.width)
+        self._grid = _GridView(gridframe, game)
+        if self._grid.scrollable:
+            xbar = Scrollbar(gridframe, orient=HORIZONTAL,
+                command=self._grid.xview)
+            ybar = Scrollbar(gridframe, orient=VERTICAL,
+                command=self._grid.yview)
+            self._grid.config(xscrollcommand=xbar.set,
+                yscrollcommand=ybar.set)
+            xbar.pack(side=BOTTOM, fill=X)
+            ybar.pack(side=RIGHT, fill=Y)
         self._grid.pack(padx=30, pady=30)
 
         self._grid.bind('<ButtonRelease-1>', self.lclick)
@@ -178,14 +303,68 @@ class GameView(Frame):
 
         self._records = records
 
+        # cell changes collected inside Game.batch
+        self._batch_depth = 0
+        self._pending:dict[tuple[int,int], Item] = {}
+
+        # game savepoints before each move, the first one is not undone
+        self._undo:list[int] = []
+        self._replay:_Replay|None = None
+        # first click board being generated off the Tk thread
+        self._generation:Generation|None = None
+        self._poll_job = None
+
     def lclick(self, event:Event):
         self._free_preview()
+        if self._generation: return
         first_click = not self._game.start_coord
 
         r,c = self._grid.handle_click(event)
+        if first_click and self._game.item_at(r,c) is Item.UNOPEN:
+            board = self._pool.take(r,c) if self._pool else None
+            if not board:
+                self._generate(r,c)
+                return
+            self._game.load(*board)
+
+        if not first_click: self._undo.append(self._game.savepoint())
         if not (self._game.open(r,c)
-            or self._game.auto(r,c)): return
-
+            or self._game.auto(r,c)):
+            if not first_click: self._undo.pop()
+            return
+        self._opened(first_click)
+
+    def _generate(self, row:int, col:int):
+        self._generation = Generation(self._game.mode, row, col,
+            self._game.collects_stats)
+        self._poll()
+
+    def _poll(self):
+        gen = self._generation
+        try: board = gen.poll()
+        except Exception:
+            # let the next click start over
+            self._generation = self._poll_job = None
+            self.adjust_stt()
+            raise
+        if not board:
+            self._sttbar.generating(gen.safes_left)
+            self._poll_job = self.after(50, self._poll)
+            return
+
+        self._generation = self._poll_job = None
+        mines, start, stats = board
+        self._game.load(mines, start, stats)
+        self._game.open(*start)
+        self._opened(True)
+
+    def _cancel_generation(self):
+        if not self._generation: return
+        self._generation.cancel()
+        self.after_cancel(self._poll_job)
+        self._generation = self._poll_job = None
+
+    def _opened(self, first_click:bool):
         self.adjust_stt()
         if first_click: self._timer.start()
 
@@ -201,17 +380,67 @@ class GameView(Frame):
         self._records.sort(key=lambda x:x[1])
 
     def rclick(self, event:Event):
+        if self._generation: return
         r,c = self._grid.handle_click(event)
+        started = bool(self._game.start_coord)
+        if started: self._undo.append(self._game.savepoint())
         if not (self._game.flag(r,c)
-            or self._game.unflag(r,c)): return
+            or self._game.unflag(r,c)):
+            if started: self._undo.pop()
+            return
+
+        self.adjust_stt()
+
+    def undo(self):
+        '''Take back the last move, a won game is final'''
+        state = self._game.state
+        if not self._undo or state is GameState.WIN: return
 
+        self._game.rollback(self._undo.pop())
         self.adjust_stt()
+        if state is GameState.LOSE: self._timer.start()
+
+    def replay(self, trace:list[tuple[str,int,int]]):
+        '''Restart the game and play the moves of a solver trace'''
+        self.cancel_replay()
+        self._game.restart(False)
+        self._undo.clear()
+        self.adjust_stt()
+        self._replay = _Replay(self, trace)
+        self._replay.start()
+
+    def play(self, action:str, row:int, col:int):
+        if action == 'open': self._game.open(row,col, False)
+        else: self._game.flag(row,col)
+        self.adjust_stt()
+
+    def pause_replay(self):
+        if self._replay: self._replay.toggle_pause()
+
+    def replay_speed(self, d:int):
+        if self._replay: self._replay.change_speed(d)
+
+    def cancel_replay(self):
+        if self._replay: self._replay.cancel()
+        self._replay = None
+
+    def destroy(self):
+        self.cancel_replay()
+        self._cancel_generation()
+        super().destroy()
 
     def reset(self):
+        self.cancel_replay()
+        self._cancel_generation()
         self._game.restart()
+        self._undo.clear()
         self.adjust_stt()
         self._timer.reset()
 
+    @property
+    def game(self):
+        return self._game
+
     def adjust_stt(self):
         self._sttbar.adjust(
             self._game.mines_left,
@@ -220,7 +449,25 @@ class GameView(Frame):
         )
 
     def adjust_grid(self, row:int, col:int, item:Item):
+        if self._batch_depth:
+            self._pending[row,col] = item
+            return
+
         self._grid.adjust(row, col, item)
+        self.update()
+
+    def begin(self):
+        self._batch_depth += 1
+
+    def commit(self):
+        assert self._batch_depth > 0
+        self._batch_depth -= 1
+        if self._batch_depth: return
+
+        for (r,c), item in self._pending.items():
+            self._grid.adjust(r,c, item)
+        self._pending.clear()
+        self.update_idletasks()
 
     def _preview(self, event:Event):
         r,c = self._grid.handle_click(event)